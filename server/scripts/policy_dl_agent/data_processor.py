@@ -5,7 +5,7 @@ Handles loading, preprocessing, and batching of panel data for the Transformer m
 
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Optional
 import json
 from io import StringIO
 
@@ -64,12 +64,40 @@ class PanelDataProcessor:
         else:
             return self._prepare_panel_data(df, entity_col, time_col, feature_cols, target_cols, lookback, pred_horizon)
     
+    def prepare_inference(
+        self,
+        df: pd.DataFrame,
+        entity_col: str,
+        time_col: str,
+        feature_cols: List[str],
+        target_cols: List[str],
+        lookback: int = 5,
+        pred_horizon: int = 1,
+        data_type: str = 'panel'
+    ) -> Dict:
+        """
+        Prepare only the test split (X_test, y_test, entity_test) for inference.
+        
+        Same windows, normalization and split as prepare_data, but the train and
+        validation arrays are never materialized.
+        """
+        self.feature_names = feature_cols
+        self.target_names = target_cols
+        self.data_type = data_type
+        
+        if data_type == 'cross_section':
+            return self._prepare_cross_section_data(df, entity_col, feature_cols, target_cols, test_only=True)
+        else:
+            return self._prepare_panel_data(df, entity_col, time_col, feature_cols, target_cols, lookback, pred_horizon,
+                                            test_only=True)
+    
     def _prepare_cross_section_data(
         self,
         df: pd.DataFrame,
         id_col: Optional[str],
         feature_cols: List[str],
-        target_cols: List[str]
+        target_cols: List[str],
+        test_only: bool = False
     ) -> Dict:
         """Prepare cross-sectional data for MLP/simple model training."""
         
@@ -108,25 +136,12 @@ class PanelDataProcessor:
         # Shuffle indices
         indices = np.random.permutation(n_samples)
         
-        return {
-            'X_train': X[indices[:train_idx]],
-            'y_train': y[indices[:train_idx]],
-            'entity_train': entity_ids[indices[:train_idx]],
-            'X_val': X[indices[train_idx:val_idx]],
-            'y_val': y[indices[train_idx:val_idx]],
-            'entity_val': entity_ids[indices[train_idx:val_idx]],
-            'X_test': X[indices[val_idx:]],
-            'y_test': y[indices[val_idx:]],
-            'entity_test': entity_ids[indices[val_idx:]],
-            'n_entities': 1,
-            'n_features': len(feature_cols),
-            'n_targets': len(target_cols),
-            'lookback': 1,
-            'pred_horizon': 1,
-            'feature_names': feature_cols,
-            'target_names': target_cols,
-            'data_type': 'cross_section'
-        }
+        return self._split_result(
+            X, y, entity_ids, indices, train_idx, val_idx, test_only,
+            n_entities=1, n_features=len(feature_cols), n_targets=len(target_cols),
+            lookback=1, pred_horizon=1, feature_names=feature_cols, target_names=target_cols,
+            data_type='cross_section'
+        )
     
     def _prepare_panel_data(
         self,
@@ -136,7 +151,8 @@ class PanelDataProcessor:
         feature_cols: List[str],
         target_cols: List[str],
         lookback: int,
-        pred_horizon: int
+        pred_horizon: int,
+        test_only: bool = False
     ) -> Dict:
         """Prepare panel data for Transformer training."""
         
@@ -194,25 +210,36 @@ class PanelDataProcessor:
         # Shuffle indices
         indices = np.random.permutation(n)
         
-        return {
-            'X_train': X[indices[:train_idx]],
-            'y_train': y[indices[:train_idx]],
-            'entity_train': entity_ids[indices[:train_idx]],
-            'X_val': X[indices[train_idx:val_idx]],
-            'y_val': y[indices[train_idx:val_idx]],
-            'entity_val': entity_ids[indices[train_idx:val_idx]],
-            'X_test': X[indices[val_idx:]],
-            'y_test': y[indices[val_idx:]],
-            'entity_test': entity_ids[indices[val_idx:]],
-            'n_entities': len(entities),
-            'n_features': len(feature_cols),
-            'n_targets': len(target_cols),
-            'lookback': lookback,
-            'pred_horizon': pred_horizon,
-            'feature_names': feature_cols,
-            'target_names': target_cols,
-            'data_type': 'panel'
-        }
+        return self._split_result(
+            X, y, entity_ids, indices, train_idx, val_idx, test_only,
+            n_entities=len(entities), n_features=len(feature_cols), n_targets=len(target_cols),
+            lookback=lookback, pred_horizon=pred_horizon, feature_names=feature_cols, target_names=target_cols,
+            data_type='panel'
+        )
+    
+    @staticmethod
+    def _split_result(
+        X: np.ndarray,
+        y: np.ndarray,
+        entity_ids: np.ndarray,
+        indices: np.ndarray,
+        train_idx: int,
+        val_idx: int,
+        test_only: bool,
+        **metadata
+    ) -> Dict:
+        """Train/val/test arrays from the shuffled indices (test only if test_only), plus metadata."""
+        splits = {'test': indices[val_idx:]}
+        if not test_only:
+            splits = {'train': indices[:train_idx], 'val': indices[train_idx:val_idx], **splits}
+        
+        result = {}
+        for name, split in splits.items():
+            result[f'X_{name}'] = X[split]
+            result[f'y_{name}'] = y[split]
+            result[f'entity_{name}'] = entity_ids[split]
+        result.update(metadata)
+        return result
     
     def denormalize_predictions(self, predictions: np.ndarray) -> np.ndarray:
         """Convert normalized predictions back to original scale."""
@@ -246,17 +273,3 @@ class PanelDataProcessor:
         self.feature_names = params.get('feature_names', [])
         self.target_names = params.get('target_names', [])
         self.data_type = params.get('data_type', 'panel')
-
-
-def create_batches(X: np.ndarray, y: np.ndarray, entity_ids: np.ndarray, 
-                   batch_size: int) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
-    """Create batches for training."""
-    n = len(X)
-    indices = np.random.permutation(n)
-    batches = []
-    
-    for i in range(0, n, batch_size):
-        batch_idx = indices[i:i+batch_size]
-        batches.append((X[batch_idx], y[batch_idx], entity_ids[batch_idx]))
-    
-    return batches
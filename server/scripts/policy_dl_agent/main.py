@@ -2,6 +2,7 @@
 """
 Main entry point for the Policy Deep Learning Agent.
 Receives JSON input from stdin and outputs JSON results to stdout.
+With --serve, stays alive and handles newline-delimited JSON requests.
 """
 
 import sys
@@ -11,6 +12,10 @@ import torch
 import traceback
 import base64
 import io
+import hashlib
+import gc
+import contextlib
+from collections import OrderedDict
 from typing import Dict, Any, Tuple, Optional, List
 
 # Suppress warnings
@@ -23,13 +28,51 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from data_processor import PanelDataProcessor
-from model import PanelTransformer
+from model import PanelTransformer, autocast_context, inference_dtype, prepare_inference_model, to_device
 from trainer import PolicyTrainer, compute_feature_importance
 from optimizer import PolicyOptimizer, RewardFunctionLoader, EvolutionaryOptimizer
 
+# Probed once per process; every handler runs on the same device
+DEVICE = 'cuda' if torch.cuda.is_available() else 'cpu'
+TORCH_DEFAULT_DTYPE = torch.float32
+
+# Models deserialized from modelState(s), keyed by a hash of the state blob.
+# Only used in --serve mode (_SERVING), where the process outlives a single
+# request; a one-shot process could never hit, so it skips the hashing too.
+_SERVING = False
+_MODEL_CACHE: 'OrderedDict[str, Tuple[PanelTransformer, Optional[List[PanelTransformer]]]]' = OrderedDict()
+_MODEL_CACHE_SIZE = 8
+# Inference-ready (cast / quantized / frozen) copies of those models,
+# keyed by (state hash, device, dtype, quantize)
+_PREPARED_CACHE: 'OrderedDict[Tuple, Tuple[torch.nn.Module, Optional[List[torch.nn.Module]]]]' = OrderedDict()
+
+
+def _plot_entry(title: str, buf: io.BytesIO, encoding: str = 'base64') -> Dict:
+    """
+    Package a rendered PNG for the JSON response.
+    With encoding='zstd+base64' (and zstandard installed) the PNG bytes are
+    zstd-compressed before base64 and the entry is tagged so clients can decode it.
+    """
+    png_bytes = buf.getvalue()
+    if encoding == 'zstd+base64':
+        try:
+            import zstandard as zstd
+            return {
+                'title': title,
+                'image': base64.b64encode(zstd.ZstdCompressor(level=3).compress(png_bytes)).decode('utf-8'),
+                'encoding': 'zstd+base64'
+            }
+        except ImportError:
+            pass
+    return {
+        'title': title,
+        'image': base64.b64encode(png_bytes).decode('utf-8')
+    }
+
 
 def generate_plots(history: Dict, predictions: np.ndarray = None, 
-                   targets: np.ndarray = None, feature_importance: Dict = None) -> list:
+                   targets: np.ndarray = None, feature_importance: Dict = None,
+                   encoding: str = 'base64') -> list:
     """Generate visualization plots as base64 images."""
     try:
         import matplotlib
@@ -54,20 +97,19 @@ def generate_plots(history: Dict, predictions: np.ndarray = None,
             
             buf = io.BytesIO()
             plt.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-            buf.seek(0)
-            plots.append({
-                'title': 'Training Progress',
-                'image': base64.b64encode(buf.read()).decode('utf-8')
-            })
+            plots.append(_plot_entry('Training Progress', buf, encoding))
             plt.close(fig)
         
         # Feature importance plot
         if feature_importance and len(feature_importance) > 0:
             fig, ax = plt.subplots(figsize=(10, max(5, len(feature_importance) * 0.4)))
             
-            sorted_features = sorted(feature_importance.items(), key=lambda x: x[1], reverse=True)
-            names = [f[0] for f in sorted_features]
-            values = [f[1] for f in sorted_features]
+            # Descending by importance; stable sort keeps ties in input order
+            keys = np.array(list(feature_importance), dtype=object)
+            vals = np.fromiter(feature_importance.values(), dtype=np.float64, count=len(feature_importance))
+            order = np.argsort(-vals, kind='stable')
+            names = keys[order]
+            values = vals[order]
             
             colors = plt.cm.viridis(np.linspace(0.3, 0.9, len(names)))
             bars = ax.barh(names, values, color=colors)
@@ -77,11 +119,7 @@ def generate_plots(history: Dict, predictions: np.ndarray = None,
             
             buf = io.BytesIO()
             plt.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-            buf.seek(0)
-            plots.append({
-                'title': 'Feature Importance',
-                'image': base64.b64encode(buf.read()).decode('utf-8')
-            })
+            plots.append(_plot_entry('Feature Importance', buf, encoding))
             plt.close(fig)
         
         # Prediction vs Actual scatter plot
@@ -106,11 +144,7 @@ def generate_plots(history: Dict, predictions: np.ndarray = None,
             
             buf = io.BytesIO()
             plt.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-            buf.seek(0)
-            plots.append({
-                'title': 'Predictions vs Actual',
-                'image': base64.b64encode(buf.read()).decode('utf-8')
-            })
+            plots.append(_plot_entry('Predictions vs Actual', buf, encoding))
             plt.close(fig)
         
         return plots
@@ -119,6 +153,13 @@ def generate_plots(history: Dict, predictions: np.ndarray = None,
         return []
 
 
+def _release_device_memory():
+    """Drop unreachable model/optimizer tensors and hand cached CUDA blocks back to the driver."""
+    gc.collect()
+    if DEVICE == 'cuda':
+        torch.cuda.empty_cache()
+
+
 def _train_single_model(input_data: Dict, data: Dict, processor: PanelDataProcessor,
                         device: str, seed: Optional[int] = None) -> Tuple[Dict, Dict, np.ndarray]:
     """Train one model; return model_state, training_result, test_predictions."""
@@ -151,23 +192,27 @@ def _train_single_model(input_data: Dict, data: Dict, processor: PanelDataProces
         d_ff=d_ff,
         dropout=dropout,
         lookback=lookback,
-        pred_horizon=pred_horizon
+        pred_horizon=pred_horizon,
+        device=device
     )
-    trainer = PolicyTrainer(model=model, learning_rate=learning_rate, device=device)
+    trainer = PolicyTrainer(model=model, learning_rate=learning_rate, device=device,
+                            use_amp=bool(input_data.get('useAmp', False)))
     training_result = trainer.train(
         data=data, epochs=epochs, batch_size=batch_size, early_stopping_patience=15
     )
     model.eval()
-    with torch.no_grad():
-        X_test = torch.tensor(data['X_test'], dtype=torch.float32).to(device)
-        entity_test = torch.tensor(data['entity_test'], dtype=torch.long).to(device)
+    with torch.inference_mode(), autocast_context(device):
+        X_test = to_device(data['X_test'], device, TORCH_DEFAULT_DTYPE)
+        entity_test = to_device(data['entity_test'], device, torch.long)
         test_predictions, _ = model(X_test, entity_test)
-        test_predictions = test_predictions.cpu().numpy()
+        test_predictions = test_predictions.float().cpu().numpy()
     model_state = {
         'state_dict': {k: v.cpu().tolist() for k, v in model.state_dict().items()},
         'config': model.get_config(),
         'data_params': processor.get_normalization_params()
     }
+    # Only host-side copies leave this function; drop device references eagerly
+    del trainer, model, X_test, entity_test
     return model_state, training_result, test_predictions
 
 
@@ -190,6 +235,7 @@ def handle_train(input_data: Dict) -> Dict:
     lookback = input_data.get('lookback', 5)
     pred_horizon = input_data.get('predHorizon', 1)
     use_ensemble = input_data.get('useEnsemble', False)
+    plot_encoding = input_data.get('plotEncoding', 'base64')
     processor = PanelDataProcessor()
     df = processor.load_csv(csv_data)
     data = processor.prepare_data(
@@ -197,24 +243,28 @@ def handle_train(input_data: Dict) -> Dict:
         feature_cols=feature_cols, target_cols=target_cols,
         lookback=lookback, pred_horizon=pred_horizon, data_type=data_type
     )
-    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    device = DEVICE
     if use_ensemble:
         model_states = []
         all_preds = []
         seeds = [42, 123, 456]
         training_result_0 = None
         for i, seed in enumerate(seeds):
-            model_state, training_result, test_predictions = _train_single_model(
-                input_data, data, processor, device, seed=seed
-            )
-            model_states.append(model_state)
-            all_preds.append(test_predictions)
-            if i == 0:
-                training_result_0 = training_result
+            try:
+                model_state, training_result, test_predictions = _train_single_model(
+                    input_data, data, processor, device, seed=seed
+                )
+                model_states.append(model_state)
+                all_preds.append(test_predictions)
+                if i == 0:
+                    training_result_0 = training_result
+            finally:
+                # Peak VRAM stays at one model instead of accumulating across seeds
+                _release_device_memory()
         # Feature importance from first model
         config = model_states[0]['config']
-        model0 = PanelTransformer.from_config(config)
-        state_dict = {k: torch.tensor(v) for k, v in model_states[0]['state_dict'].items()}
+        model0 = PanelTransformer.from_config(config, skip_init=True)
+        state_dict = {k: torch.tensor(v, dtype=TORCH_DEFAULT_DTYPE) for k, v in model_states[0]['state_dict'].items()}
         model0.load_state_dict(state_dict)
         model0.to(device)
         feature_importance = compute_feature_importance(
@@ -228,7 +278,8 @@ def handle_train(input_data: Dict) -> Dict:
             history=training_result_0['history'],
             predictions=pred_mean,
             targets=data['y_test'],
-            feature_importance=feature_importance
+            feature_importance=feature_importance,
+            encoding=plot_encoding
         )
         return {
             'success': True,
@@ -251,8 +302,8 @@ def handle_train(input_data: Dict) -> Dict:
         input_data, data, processor, device, seed=42
     )
     config = model_state['config']
-    model = PanelTransformer.from_config(config)
-    state_dict = {k: torch.tensor(v) for k, v in model_state['state_dict'].items()}
+    model = PanelTransformer.from_config(config, skip_init=True)
+    state_dict = {k: torch.tensor(v, dtype=TORCH_DEFAULT_DTYPE) for k, v in model_state['state_dict'].items()}
     model.load_state_dict(state_dict)
     model.to(device)
     feature_importance = compute_feature_importance(
@@ -263,7 +314,8 @@ def handle_train(input_data: Dict) -> Dict:
         history=training_result['history'],
         predictions=test_predictions,
         targets=data['y_test'],
-        feature_importance=feature_importance
+        feature_importance=feature_importance,
+        encoding=plot_encoding
     )
     return {
         'success': True,
@@ -280,15 +332,77 @@ def handle_train(input_data: Dict) -> Dict:
     }
 
 
-def _load_models_from_state(model_state_or_states) -> Tuple[PanelTransformer, Optional[List[PanelTransformer]]]:
-    """Load one model or a list of models from modelState or modelStates."""
-    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+def _state_hash(model_state_or_states) -> str:
+    """Stable hash of a modelState / modelStates blob."""
+    blob = json.dumps(model_state_or_states, separators=(',', ':')).encode('utf-8')
+    return hashlib.blake2b(blob, digest_size=16).hexdigest()
+
+
+def _load_models_from_state(model_state_or_states,
+                            key: Optional[str] = None) -> Tuple[PanelTransformer, Optional[List[PanelTransformer]]]:
+    """Load one model or a list of models from modelState or modelStates (LRU-cached by state hash under --serve)."""
+    if not _SERVING:
+        return _build_models_from_state(model_state_or_states)
+    key = key or _state_hash(model_state_or_states)
+    if key in _MODEL_CACHE:
+        _MODEL_CACHE.move_to_end(key)
+        return _MODEL_CACHE[key]
+    loaded = _build_models_from_state(model_state_or_states)
+    _MODEL_CACHE[key] = loaded
+    if len(_MODEL_CACHE) > _MODEL_CACHE_SIZE:
+        _MODEL_CACHE.popitem(last=False)
+    return loaded
+
+
+def _load_prepared_models(model_state_or_states, device: str, dtype: Optional[torch.dtype],
+                           quantize: bool = True) -> Tuple[torch.nn.Module, Optional[List[torch.nn.Module]]]:
+    """
+    _load_models_from_state followed by prepare_inference_model. Under --serve
+    the prepared models are LRU-cached so repeated requests skip the cast/quantize/freeze.
+    """
+    if not _SERVING:
+        return _prepare_models(*_build_models_from_state(model_state_or_states), device, dtype, quantize)
+    state_key = _state_hash(model_state_or_states)
+    key = (state_key, device, str(dtype), quantize)
+    if key in _PREPARED_CACHE:
+        _PREPARED_CACHE.move_to_end(key)
+        return _PREPARED_CACHE[key]
+    loaded = _prepare_models(*_load_models_from_state(model_state_or_states, state_key), device, dtype, quantize)
+    _PREPARED_CACHE[key] = loaded
+    if len(_PREPARED_CACHE) > _MODEL_CACHE_SIZE:
+        _PREPARED_CACHE.popitem(last=False)
+    return loaded
+
+
+def _prepare_models(model: PanelTransformer, models: Optional[List[PanelTransformer]], device: str,
+                    dtype: Optional[torch.dtype], quantize: bool) -> Tuple[torch.nn.Module, Optional[List[torch.nn.Module]]]:
+    """prepare_inference_model over a (model, models) pair, preparing the shared first model once."""
+    prepared = prepare_inference_model(model, device, dtype, quantize)
+    prepared_models = None
+    if models:
+        prepared_models = [prepared if m is model else prepare_inference_model(m, device, dtype, quantize)
+                           for m in models]
+    return prepared, prepared_models
+
+
+def _inference_options(input_data: Dict) -> Tuple[Optional[torch.dtype], bool]:
+    """
+    (dtype, quantize) for prepare_inference_model, shared by every inference
+    endpoint so predict, optimize and scenario run the same numerics: BF16/FP16
+    weights on CUDA, and INT8 Linear layers on CPU only if the request sets quantize.
+    """
+    return inference_dtype(DEVICE), bool(input_data.get('quantize', False))
+
+
+def _build_models_from_state(model_state_or_states) -> Tuple[PanelTransformer, Optional[List[PanelTransformer]]]:
+    """Deserialize one model or a list of models from modelState or modelStates."""
+    device = DEVICE
     if isinstance(model_state_or_states, list) and len(model_state_or_states) > 0:
         models = []
         for ms in model_state_or_states:
             config = ms['config']
-            m = PanelTransformer.from_config(config)
-            state_dict = {k: torch.tensor(v) for k, v in ms['state_dict'].items()}
+            m = PanelTransformer.from_config(config, skip_init=True)
+            state_dict = {k: torch.tensor(v, dtype=TORCH_DEFAULT_DTYPE) for k, v in ms['state_dict'].items()}
             m.load_state_dict(state_dict)
             m.to(device)
             m.eval()
@@ -296,8 +410,8 @@ def _load_models_from_state(model_state_or_states) -> Tuple[PanelTransformer, Op
         return models[0], models
     ms = model_state_or_states
     config = ms['config']
-    model = PanelTransformer.from_config(config)
-    state_dict = {k: torch.tensor(v) for k, v in ms['state_dict'].items()}
+    model = PanelTransformer.from_config(config, skip_init=True)
+    state_dict = {k: torch.tensor(v, dtype=TORCH_DEFAULT_DTYPE) for k, v in ms['state_dict'].items()}
     model.load_state_dict(state_dict)
     model.to(device)
     model.eval()
@@ -311,9 +425,10 @@ def handle_optimize(input_data: Dict) -> Dict:
     if not model_state and not model_states:
         return {'success': False, 'error': 'No model state provided. Train a model first.'}
     state_to_use = model_states if model_states else model_state
-    model, models = _load_models_from_state(state_to_use)
     config = (model_states[0] if model_states else model_state)['config']
-    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    device = DEVICE
+    dtype, quantize = _inference_options(input_data)
+    model, models = _load_prepared_models(state_to_use, device, dtype, quantize)
     processor = PanelDataProcessor()
     processor.load_normalization_params((model_states[0] if model_states else model_state)['data_params'])
     reward_code = input_data.get('rewardCode', '')
@@ -339,7 +454,7 @@ def handle_optimize(input_data: Dict) -> Dict:
         else:
             bounds.append((-1.0, 1.0))
     df = processor.load_csv(csv_data)
-    data = processor.prepare_data(
+    data = processor.prepare_inference(
         df=df, entity_col=entity_col, time_col=time_col,
         feature_cols=feature_cols, target_cols=target_cols,
         lookback=config['lookback'], pred_horizon=config['pred_horizon'], data_type=data_type
@@ -352,7 +467,10 @@ def handle_optimize(input_data: Dict) -> Dict:
         model=model,
         reward_loader=reward_loader,
         device=device,
-        models=models
+        models=models,
+        autocast=True,
+        quantize=quantize,
+        prepared=True
     )
     if sequence_horizon <= 1:
         result = optimizer.optimize(
@@ -376,24 +494,24 @@ def handle_optimize(input_data: Dict) -> Dict:
             'iterations': result['iterations'],
             'policyPath': None
         }
-    # Sequential: run optimization for each period with context
-    path = []
-    last_result = None
-    for t in range(1, sequence_horizon + 1):
-        ctx = {'period': t, 'totalPeriods': sequence_horizon}
-        last_result = optimizer.optimize(
-            base_features=data['X_test'],
-            entity_ids=data['entity_test'],
-            policy_feature_names=policy_features,
-            feature_names=feature_cols,
-            target_names=target_cols,
-            bounds=bounds,
-            method=method,
-            max_iterations=max_iterations,
-            context=ctx,
-            constraints=constraints
-        )
-        path.append({'period': t, 'optimalParams': last_result['optimal_params']})
+    # Sequential: optimize one parameter set per period jointly, all periods batched
+    contexts = [{'period': t, 'totalPeriods': sequence_horizon} for t in range(1, sequence_horizon + 1)]
+    last_result = optimizer.optimize(
+        base_features=data['X_test'],
+        entity_ids=data['entity_test'],
+        policy_feature_names=policy_features,
+        feature_names=feature_cols,
+        target_names=target_cols,
+        bounds=bounds,
+        method=method,
+        max_iterations=max_iterations,
+        constraints=constraints,
+        contexts=contexts
+    )
+    path = [
+        {'period': ctx['period'], 'optimalParams': period['optimal_params']}
+        for ctx, period in zip(contexts, last_result['period_results'])
+    ]
     return {
         'success': True,
         'optimalParams': last_result['optimal_params'],
@@ -414,9 +532,10 @@ def handle_predict(input_data: Dict) -> Dict:
     if not model_state and not model_states:
         return {'success': False, 'error': 'No model state provided.'}
     state_to_use = model_states if model_states else model_state
-    model, models = _load_models_from_state(state_to_use)
     config = (model_states[0] if model_states else model_state)['config']
-    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    device = DEVICE
+    dtype, quantize = _inference_options(input_data)
+    model, models = _load_prepared_models(state_to_use, device, dtype, quantize)
     processor = PanelDataProcessor()
     processor.load_normalization_params((model_states[0] if model_states else model_state)['data_params'])
     csv_data = input_data.get('data')
@@ -427,7 +546,7 @@ def handle_predict(input_data: Dict) -> Dict:
     target_cols = input_data.get('targetCols', [])
     
     df = processor.load_csv(csv_data)
-    data = processor.prepare_data(
+    data = processor.prepare_inference(
         df=df,
         entity_col=entity_col,
         time_col=time_col,
@@ -438,14 +557,14 @@ def handle_predict(input_data: Dict) -> Dict:
         data_type=data_type
     )
     
-    X = torch.tensor(data['X_test'], dtype=torch.float32).to(device)
-    entity_ids = torch.tensor(data['entity_test'], dtype=torch.long).to(device)
+    X = to_device(data['X_test'], device, dtype or TORCH_DEFAULT_DTYPE)
+    entity_ids = to_device(data['entity_test'], device, torch.long)
     if models:
         all_preds = []
-        with torch.no_grad():
+        with torch.inference_mode(), autocast_context(device):
             for m in models:
                 pred, _ = m(X, entity_ids)
-                all_preds.append(pred.cpu().numpy())
+                all_preds.append(pred.float().cpu().numpy())
         predictions = np.mean(all_preds, axis=0)
         predictions_std = np.std(all_preds, axis=0)
         predictions_denorm = processor.denormalize_predictions(predictions)
@@ -455,9 +574,9 @@ def handle_predict(input_data: Dict) -> Dict:
             'targetNames': target_cols,
             'predictionStd': predictions_std.tolist()
         }
-    with torch.no_grad():
+    with torch.inference_mode(), autocast_context(device):
         predictions, _ = model(X, entity_ids, return_attention=True)
-        predictions = predictions.cpu().numpy()
+        predictions = predictions.float().cpu().numpy()
     predictions_denorm = processor.denormalize_predictions(predictions)
     return {
         'success': True,
@@ -483,15 +602,9 @@ def handle_scenario_analysis(input_data: Dict) -> Dict:
     
     # Recreate model
     config = model_state['config']
-    device = 'cuda' if torch.cuda.is_available() else 'cpu'
-    
-    model = PanelTransformer.from_config(config)
-    state_dict = {}
-    for k, v in model_state['state_dict'].items():
-        state_dict[k] = torch.tensor(v)
-    model.load_state_dict(state_dict)
-    model.to(device)
-    model.eval()
+    device = DEVICE
+    dtype, quantize = _inference_options(input_data)
+    model, _ = _load_prepared_models(model_state, device, dtype, quantize)
     
     # Load data
     processor = PanelDataProcessor()
@@ -506,7 +619,7 @@ def handle_scenario_analysis(input_data: Dict) -> Dict:
     scenarios = input_data.get('scenarios', {})
     
     df = processor.load_csv(csv_data)
-    data = processor.prepare_data(
+    data = processor.prepare_inference(
         df=df,
         entity_col=entity_col,
         time_col=time_col,
@@ -521,7 +634,10 @@ def handle_scenario_analysis(input_data: Dict) -> Dict:
     optimizer = PolicyOptimizer(
         model=model,
         reward_loader=reward_loader,
-        device=device
+        device=device,
+        autocast=True,
+        quantize=quantize,
+        prepared=True
     )
     
     result = optimizer.scenario_analysis(
@@ -538,36 +654,72 @@ def handle_scenario_analysis(input_data: Dict) -> Dict:
     }
 
 
+def dispatch(input_data: Dict) -> Dict:
+    """Route a single request to its handler."""
+    action = input_data.get('action', 'train')
+    
+    if action == 'train':
+        return handle_train(input_data)
+    elif action == 'optimize':
+        return handle_optimize(input_data)
+    elif action == 'predict':
+        return handle_predict(input_data)
+    elif action == 'scenario':
+        return handle_scenario_analysis(input_data)
+    return {'success': False, 'error': f'Unknown action: {action}'}
+
+
+def _error_result(e: Exception) -> Dict:
+    return {
+        'success': False,
+        'error': str(e),
+        'traceback': traceback.format_exc()
+    }
+
+
+def serve():
+    """
+    Long-lived worker mode: read one JSON request per line from stdin and
+    write one JSON result per line to stdout. Keeps torch imported, the CUDA
+    context alive and recently used models cached between requests.
+    """
+    global _SERVING
+    _SERVING = True
+    while True:
+        line = sys.stdin.readline()
+        if not line:
+            break
+        if not line.strip():
+            continue
+        out = sys.stdout
+        try:
+            # Anything a handler prints goes to stderr; stdout carries only responses
+            with contextlib.redirect_stdout(sys.stderr):
+                result = dispatch(json.loads(line))
+        except Exception as e:
+            result = _error_result(e)
+        out.write(json.dumps(result) + '\n')
+        out.flush()
+
+
 def main():
     """Main entry point."""
+    if '--serve' in sys.argv[1:]:
+        serve()
+        return
+    
     try:
         # Read input from stdin
         input_str = sys.stdin.read()
         input_data = json.loads(input_str)
         
-        action = input_data.get('action', 'train')
-        
-        if action == 'train':
-            result = handle_train(input_data)
-        elif action == 'optimize':
-            result = handle_optimize(input_data)
-        elif action == 'predict':
-            result = handle_predict(input_data)
-        elif action == 'scenario':
-            result = handle_scenario_analysis(input_data)
-        else:
-            result = {'success': False, 'error': f'Unknown action: {action}'}
+        result = dispatch(input_data)
         
         # Output result
         print(json.dumps(result))
         
     except Exception as e:
-        error_result = {
-            'success': False,
-            'error': str(e),
-            'traceback': traceback.format_exc()
-        }
-        print(json.dumps(error_result))
+        print(json.dumps(_error_result(e)))
 
 
 if __name__ == '__main__':
@@ -3,17 +3,35 @@ Panel Data Transformer Model
 A Transformer architecture designed for panel data with temporal and cross-entity attention.
 """
 
+import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import math
+import copy
+import contextlib
+import sys
 from typing import Optional, Tuple
 
+try:
+    # Optional: apex's fused CUDA LayerNorm (one read/normalize/write kernel)
+    from apex.normalization import FusedLayerNorm as _FusedLayerNorm
+except ImportError:
+    _FusedLayerNorm = None
+
+
+def _layer_norm(d_model: int, device: str = 'cpu') -> nn.Module:
+    """LayerNorm for the encoder; apex's fused kernel when installed and the model runs on CUDA."""
+    if _FusedLayerNorm is not None and device.startswith('cuda'):
+        return _FusedLayerNorm(d_model)
+    return nn.LayerNorm(d_model)
+
 
 class PositionalEncoding(nn.Module):
     """Sinusoidal positional encoding for temporal sequences."""
     
-    def __init__(self, d_model: int, max_len: int = 500, dropout: float = 0.1):
+    def __init__(self, d_model: int, max_len: int = 500, dropout: float = 0.1,
+                 seq_len: Optional[int] = None):
         super().__init__()
         self.dropout = nn.Dropout(p=dropout)
         
@@ -25,13 +43,21 @@ class PositionalEncoding(nn.Module):
         pe[:, 1::2] = torch.cos(position * div_term)
         
         self.register_buffer('pe', pe.unsqueeze(0))
+        # Encoding for the model's input length, added without slicing on each call
+        seq_len = max_len if seq_len is None else min(seq_len, max_len)
+        self.register_buffer('pe_slice', pe[:seq_len].unsqueeze(0).clone(), persistent=False)
     
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         """
         Args:
             x: Tensor of shape [batch, seq_len, d_model]
         """
-        x = x + self.pe[:, :x.size(1)]
+        if x.size(1) == self.pe_slice.size(1):
+            x = x + self.pe_slice
+        else:
+            x = x + self.pe[:, :x.size(1)]
+        if not self.training:
+            return x
         return self.dropout(x)
 
 
@@ -45,37 +71,79 @@ class MultiHeadAttention(nn.Module):
         self.d_model = d_model
         self.num_heads = num_heads
         self.d_k = d_model // num_heads
+        self.scale = self.d_k ** -0.5  # 1/sqrt(d_k), precomputed for the explicit path
         
-        self.W_q = nn.Linear(d_model, d_model)
-        self.W_k = nn.Linear(d_model, d_model)
-        self.W_v = nn.Linear(d_model, d_model)
+        # Q, K and V projections fused into one GEMM of 3x width
+        self.W_qkv = nn.Linear(d_model, 3 * d_model)
         self.W_o = nn.Linear(d_model, d_model)
         
         self.dropout = nn.Dropout(p=dropout)
     
+    def _load_from_state_dict(self, state_dict, prefix, local_metadata, strict,
+                              missing_keys, unexpected_keys, error_msgs):
+        # Model states saved before the fusion carry separate W_q/W_k/W_v entries
+        legacy = [f'{prefix}W_{name}.weight' for name in ('q', 'k', 'v')]
+        if all(k in state_dict for k in legacy):
+            for param in ('weight', 'bias'):
+                parts = [state_dict.pop(f'{prefix}W_{name}.{param}') for name in ('q', 'k', 'v')]
+                state_dict[f'{prefix}W_qkv.{param}'] = torch.cat(parts, dim=0)
+        super()._load_from_state_dict(state_dict, prefix, local_metadata, strict,
+                                      missing_keys, unexpected_keys, error_msgs)
+    
     def forward(self, query: torch.Tensor, key: torch.Tensor, value: torch.Tensor,
-                mask: Optional[torch.Tensor] = None) -> Tuple[torch.Tensor, torch.Tensor]:
+                mask: Optional[torch.Tensor] = None,
+                need_weights: bool = False,
+                last_only: bool = False) -> Tuple[torch.Tensor, Optional[torch.Tensor]]:
+        """
+        With last_only=True only the final query position is attended from, so the
+        output is [batch, 1, d_model] (keys and values still cover every position).
+        """
         batch_size = query.size(0)
         
         # Linear projections
-        Q = self.W_q(query).view(batch_size, -1, self.num_heads, self.d_k).transpose(1, 2)
-        K = self.W_k(key).view(batch_size, -1, self.num_heads, self.d_k).transpose(1, 2)
-        V = self.W_v(value).view(batch_size, -1, self.num_heads, self.d_k).transpose(1, 2)
-        
-        # Attention scores
-        scores = torch.matmul(Q, K.transpose(-2, -1)) / math.sqrt(self.d_k)
-        
-        if mask is not None:
-            scores = scores.masked_fill(mask == 0, -1e9)
-        
-        attn_weights = F.softmax(scores, dim=-1)
-        attn_weights = self.dropout(attn_weights)
-        
-        # Apply attention to values
-        context = torch.matmul(attn_weights, V)
-        
-        # Concatenate heads
-        context = context.transpose(1, 2).contiguous().view(batch_size, -1, self.d_model)
+        if key is query and value is query:
+            # Self-attention: one fused projection, unbound into [batch, T, heads, d_k] views.
+            # The head transpose is a stride change only; d_k stays unit-stride for SDPA.
+            qkv = self.W_qkv(query).reshape(batch_size, -1, 3, self.num_heads, self.d_k)
+            Q, K, V = qkv.unbind(dim=2)
+            Q, K, V = Q.transpose(1, 2), K.transpose(1, 2), V.transpose(1, 2)
+        else:
+            d = self.d_model
+            Q = self.W_qkv(query)[..., :d].reshape(batch_size, -1, self.num_heads, self.d_k).transpose(1, 2)
+            K = self.W_qkv(key)[..., d:2 * d].reshape(batch_size, -1, self.num_heads, self.d_k).transpose(1, 2)
+            V = self.W_qkv(value)[..., 2 * d:].reshape(batch_size, -1, self.num_heads, self.d_k).transpose(1, 2)
+        
+        if last_only:
+            Q = Q[:, :, -1:, :]
+            if mask is not None and mask.dim() >= 2 and mask.size(-2) > 1:
+                mask = mask[..., -1:, :]
+        
+        if need_weights:
+            # Explicit path: materializes the [batch, heads, T, T] attention weights
+            # Scale Q rather than the [T, T] scores; SDPA applies the same scale internally
+            scores = torch.matmul(Q * self.scale, K.transpose(-2, -1))
+            
+            if mask is not None:
+                scores = scores.masked_fill(mask == 0, -1e9)
+            
+            attn_weights = F.softmax(scores, dim=-1)
+            attn_weights = self.dropout(attn_weights)
+            
+            # Apply attention to values
+            context = torch.matmul(attn_weights, V)
+        else:
+            # Fused kernel (FlashAttention / memory-efficient); weights are never built
+            attn_mask = mask.to(torch.bool) if mask is not None else None
+            context = F.scaled_dot_product_attention(
+                Q, K, V,
+                attn_mask=attn_mask,
+                dropout_p=self.dropout.p if self.training else 0.0,
+                is_causal=False
+            )
+            attn_weights = None
+        
+        # Concatenate heads (reshape copies only when the strides require it)
+        context = context.transpose(1, 2).reshape(batch_size, -1, self.d_model)
         output = self.W_o(context)
         
         return output, attn_weights
@@ -97,26 +165,40 @@ class FeedForward(nn.Module):
 class TransformerEncoderLayer(nn.Module):
     """Single transformer encoder layer with self-attention and feed-forward."""
     
-    def __init__(self, d_model: int, num_heads: int, d_ff: int, dropout: float = 0.1):
+    def __init__(self, d_model: int, num_heads: int, d_ff: int, dropout: float = 0.1,
+                 device: str = 'cpu'):
         super().__init__()
         
         self.self_attn = MultiHeadAttention(d_model, num_heads, dropout)
         self.feed_forward = FeedForward(d_model, d_ff, dropout)
         
-        self.norm1 = nn.LayerNorm(d_model)
-        self.norm2 = nn.LayerNorm(d_model)
+        self.norm1 = _layer_norm(d_model, device)
+        self.norm2 = _layer_norm(d_model, device)
         
         self.dropout1 = nn.Dropout(p=dropout)
         self.dropout2 = nn.Dropout(p=dropout)
     
-    def forward(self, x: torch.Tensor, mask: Optional[torch.Tensor] = None) -> Tuple[torch.Tensor, torch.Tensor]:
+    def forward(self, x: torch.Tensor, mask: Optional[torch.Tensor] = None,
+                need_weights: bool = False,
+                last_only: bool = False) -> Tuple[torch.Tensor, Optional[torch.Tensor]]:
+        """
+        With last_only=True the residual, W_o and feed-forward are computed for the
+        final time step only and the layer returns [batch, 1, d_model].
+        """
         # Self-attention with residual connection
-        attn_output, attn_weights = self.self_attn(x, x, x, mask)
-        x = self.norm1(x + self.dropout1(attn_output))
+        # (residual dropout is skipped outside training so add + norm can fuse)
+        attn_output, attn_weights = self.self_attn(x, x, x, mask, need_weights, last_only)
+        if last_only:
+            x = x[:, -1:, :]
+        if self.training:
+            attn_output = self.dropout1(attn_output)
+        x = self.norm1(x + attn_output)
         
         # Feed-forward with residual connection
         ff_output = self.feed_forward(x)
-        x = self.norm2(x + self.dropout2(ff_output))
+        if self.training:
+            ff_output = self.dropout2(ff_output)
+        x = self.norm2(x + ff_output)
         
         return x, attn_weights
 
@@ -130,6 +212,10 @@ class PanelTransformer(nn.Module):
     - Entity embeddings
     - Multi-head self-attention across time steps
     - Cross-entity attention for capturing correlations
+    
+    `device` is the device the model will run on; it only selects the
+    LayerNorm implementation (apex's fused kernel on CUDA, when installed)
+    and does not move the module.
     """
     
     def __init__(
@@ -143,7 +229,9 @@ class PanelTransformer(nn.Module):
         d_ff: int = 512,
         dropout: float = 0.1,
         lookback: int = 5,
-        pred_horizon: int = 1
+        pred_horizon: int = 1,
+        init_weights: bool = True,
+        device: str = 'cpu'
     ):
         super().__init__()
         
@@ -151,6 +239,7 @@ class PanelTransformer(nn.Module):
         self.n_targets = n_targets
         self.n_entities = n_entities
         self.d_model = d_model
+        self.num_heads = num_heads
         self.lookback = lookback
         self.pred_horizon = pred_horizon
         
@@ -161,11 +250,12 @@ class PanelTransformer(nn.Module):
         self.entity_embedding = nn.Embedding(n_entities, d_model)
         
         # Positional encoding
-        self.pos_encoding = PositionalEncoding(d_model, max_len=lookback + pred_horizon, dropout=dropout)
+        self.pos_encoding = PositionalEncoding(d_model, max_len=lookback + pred_horizon, dropout=dropout,
+                                               seq_len=lookback)
         
         # Transformer encoder layers
         self.encoder_layers = nn.ModuleList([
-            TransformerEncoderLayer(d_model, num_heads, d_ff, dropout)
+            TransformerEncoderLayer(d_model, num_heads, d_ff, dropout, device)
             for _ in range(num_layers)
         ])
         
@@ -177,14 +267,19 @@ class PanelTransformer(nn.Module):
             nn.Linear(d_model // 2, n_targets * pred_horizon)
         )
         
-        # Initialize weights
-        self._init_weights()
+        # Initialize weights (skipped when a state dict is loaded right after)
+        if init_weights:
+            self._init_weights()
     
     def _init_weights(self):
         """Initialize model weights."""
         for p in self.parameters():
             if p.dim() > 1:
                 nn.init.xavier_uniform_(p)
+        # Initialize the fused Q/K/V weight as three separate d_model x d_model projections
+        for layer in self.encoder_layers:
+            for block in layer.self_attn.W_qkv.weight.data.chunk(3, dim=0):
+                nn.init.xavier_uniform_(block)
     
     def forward(
         self, 
@@ -216,12 +311,19 @@ class PanelTransformer(nn.Module):
         # Add positional encoding
         x = self.pos_encoding(x)
         
-        # Pass through transformer layers
-        attention_weights_list = []
-        for layer in self.encoder_layers:
-            x, attn_weights = layer(x)
-            if return_attention:
-                attention_weights_list.append(attn_weights)
+        # Pass through transformer layers; attention weights are only built when requested,
+        # written straight into one [batch, layers, heads, T, T] tensor
+        attention: Optional[torch.Tensor] = None
+        if return_attention:
+            attention = x.new_empty(batch_size, len(self.encoder_layers), self.num_heads, seq_len, seq_len)
+        # Only the last time step feeds the head, so the final layer computes just that
+        # position unless per-position attention weights were requested
+        last_layer = len(self.encoder_layers) - 1
+        for i, layer in enumerate(self.encoder_layers):
+            x, attn_weights = layer(x, need_weights=return_attention,
+                                    last_only=(i == last_layer and not return_attention))
+            if attention is not None and attn_weights is not None:
+                attention[:, i] = attn_weights
         
         # Use the last time step for prediction
         x = x[:, -1, :]  # [batch, d_model]
@@ -230,9 +332,7 @@ class PanelTransformer(nn.Module):
         output = self.output_projection(x)  # [batch, n_targets * pred_horizon]
         output = output.view(batch_size, self.pred_horizon, self.n_targets)
         
-        if return_attention:
-            return output, torch.stack(attention_weights_list, dim=1)
-        return output, None
+        return output, attention
     
     def get_config(self) -> dict:
         """Get model configuration for saving."""
@@ -241,7 +341,7 @@ class PanelTransformer(nn.Module):
             'n_targets': self.n_targets,
             'n_entities': self.n_entities,
             'd_model': self.d_model,
-            'num_heads': self.encoder_layers[0].self_attn.num_heads,
+            'num_heads': self.num_heads,
             'num_layers': len(self.encoder_layers),
             'd_ff': self.encoder_layers[0].feed_forward.linear1.out_features,
             'lookback': self.lookback,
@@ -249,22 +349,111 @@ class PanelTransformer(nn.Module):
         }
     
     @classmethod
-    def from_config(cls, config: dict) -> 'PanelTransformer':
-        """Create model from configuration."""
-        return cls(**config)
+    def from_config(cls, config: dict, skip_init: bool = False) -> 'PanelTransformer':
+        """
+        Create model from configuration.
+        
+        With skip_init=True the Xavier initialization pass is skipped; use it
+        only when a full load_state_dict follows.
+        """
+        return cls(**config, init_weights=not skip_init)
+
+
+def to_device(array: np.ndarray, device: str, dtype: torch.dtype = torch.float32) -> torch.Tensor:
+    """
+    Move a NumPy array to `device` as a tensor of `dtype`.
+    
+    The array is wrapped without a copy (torch.from_numpy); for CUDA targets the
+    host tensor is pinned and transferred asynchronously.
+    """
+    host = torch.from_numpy(np.ascontiguousarray(array, dtype=np.int64 if dtype == torch.long else np.float32))
+    if device.startswith('cuda'):
+        return host.pin_memory().to(device, dtype=dtype, non_blocking=True)
+    return host.to(device, dtype=dtype)
+
+
+def inference_dtype(device: str) -> Optional[torch.dtype]:
+    """Reduced-precision dtype for inference on `device`: BF16 if supported, else FP16; None on CPU."""
+    if not device.startswith('cuda'):
+        return None
+    return torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+
+
+def quantize_for_cpu(model: nn.Module) -> nn.Module:
+    """
+    Return an INT8 dynamically-quantized copy of `model` for CPU inference.
+    
+    All nn.Linear layers get INT8 weights with activations quantized per
+    call (FBGEMM/QNNPACK GEMMs); embeddings and positional encodings are
+    left in FP32. Returns the model unchanged if no quantized engine exists.
+    """
+    if all(engine == 'none' for engine in torch.backends.quantized.supported_engines):
+        return model
+    try:
+        return torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    except Exception:
+        return model
+
+
+def prepare_inference_model(model: nn.Module, device: str = 'cpu',
+                            dtype: Optional[torch.dtype] = None,
+                            quantize: bool = True, strict: bool = False) -> nn.Module:
+    """
+    Move a model to `device` in eval mode and freeze it with TorchScript.
+    
+    Freezing inlines weights and buffers as constants and lets the JIT fuse
+    pointwise ops. If scripting fails the error is logged to stderr and the
+    eager module is returned, or re-raised when `strict` is True.
+    With `dtype`, a copy of the model is cast first so the caller's module
+    is left in FP32. On CPU the Linear layers are quantized to INT8 unless
+    `quantize` is False.
+    """
+    if dtype is not None:
+        model = copy.deepcopy(model).to(dtype)
+    model.to(device)
+    model.eval()
+    if quantize and dtype is None and device == 'cpu':
+        model = quantize_for_cpu(model)
+    try:
+        return torch.jit.freeze(torch.jit.script(model))
+    except Exception as e:
+        if strict:
+            raise
+        print(f"TorchScript freeze failed, using the eager model: {type(e).__name__}: {e}",
+              file=sys.stderr)
+        return model
+
+
+def autocast_context(device: str, enabled: bool = True, cache_enabled: bool = True):
+    """
+    Mixed-precision context for inference-only forward passes.
+    
+    Uses BF16 where the GPU supports it and FP16 otherwise; a no-op on CPU.
+    Callers should cast outputs back with .float() before leaving torch.
+    Pass cache_enabled=False when capturing a CUDA graph.
+    """
+    dtype = inference_dtype(device)
+    if not enabled or dtype is None:
+        return contextlib.nullcontext()
+    return torch.autocast(device_type='cuda', dtype=dtype, cache_enabled=cache_enabled)
 
 
 class PolicyPredictor:
     """
     Wrapper class for making predictions with a trained model.
     Handles model loading, inference, and result formatting.
+    With autocast=True on CUDA, weights and inputs run in BF16/FP16; on CPU
+    the Linear layers run as INT8 unless quantize=False.
     """
     
-    def __init__(self, model: PanelTransformer, device: str = 'cpu'):
-        self.model = model
+    def __init__(self, model: PanelTransformer, device: str = 'cpu', autocast: bool = False,
+                 quantize: bool = True):
         self.device = device
-        self.model.to(device)
-        self.model.eval()
+        self.autocast = autocast
+        self.dtype = inference_dtype(device) if autocast else None
+        self.model = prepare_inference_model(model, device, self.dtype, quantize)
+        # False when prepare_inference_model fell back to the eager module
+        self.scripted = isinstance(self.model, torch.jit.ScriptModule)
     
     def predict(
         self, 
@@ -275,18 +464,18 @@ class PolicyPredictor:
         """Make predictions with the model."""
         self.model.eval()
         
-        with torch.no_grad():
-            x = x.to(self.device)
+        with torch.no_grad(), autocast_context(self.device, self.autocast):
+            x = x.to(self.device, dtype=self.dtype or x.dtype)
             entity_ids = entity_ids.to(self.device)
             
             predictions, attention = self.model(x, entity_ids, return_attention)
             
             result = {
-                'predictions': predictions.cpu().numpy()
+                'predictions': predictions.float().cpu().numpy()
             }
             
             if return_attention and attention is not None:
-                result['attention_weights'] = attention.cpu().numpy()
+                result['attention_weights'] = attention.float().cpu().numpy()
             
             return result
     
@@ -310,19 +499,28 @@ class PolicyPredictor:
             Dictionary with predictions for each scenario
         """
         results = {}
+        # First index of each name, as list.index would give
+        name_to_idx = {name: i for i, name in reversed(list(enumerate(feature_names)))}
         
-        # Baseline prediction
-        results['baseline'] = self.predict(base_features, entity_ids)['predictions']
-        
-        # Modified scenarios
+        # Baseline plus every modified scenario, concatenated into one batch
+        scenario_names = ['baseline']
+        batches = [base_features]
         for scenario_name, modifications in feature_modifications.items():
             modified_features = base_features.clone()
             
             for feature_name, change in modifications.items():
-                if feature_name in feature_names:
-                    idx = feature_names.index(feature_name)
+                idx = name_to_idx.get(feature_name)
+                if idx is not None:
                     modified_features[:, :, idx] += change
             
-            results[scenario_name] = self.predict(modified_features, entity_ids)['predictions']
+            scenario_names.append(scenario_name)
+            batches.append(modified_features)
+        
+        predictions = self.predict(
+            torch.cat(batches, dim=0), entity_ids.repeat(len(batches))
+        )['predictions']
+        
+        for scenario_name, scenario_predictions in zip(scenario_names, np.split(predictions, len(batches))):
+            results[scenario_name] = scenario_predictions
         
         return results
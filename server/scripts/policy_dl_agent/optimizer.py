@@ -6,13 +6,13 @@ Uses gradient-based optimization and evolutionary strategies.
 
 import torch
 import numpy as np
-from typing import Dict, List, Optional, Callable, Tuple
+from typing import Dict, List, Optional, Callable, Tuple, Union
 import importlib.util
 import sys
 from scipy.optimize import minimize, differential_evolution
 import warnings
 
-from model import PanelTransformer
+from model import PanelTransformer, autocast_context, inference_dtype, prepare_inference_model, to_device
 
 
 class RewardFunctionLoader:
@@ -23,6 +23,10 @@ class RewardFunctionLoader:
     def __init__(self):
         self.reward_func = None
         self.allowed_modules = ['numpy', 'math', 'scipy.special']
+        # Whether the loaded function can be called on whole arrays (None: not yet known)
+        self.vectorizable = None
+        # Elements of each batch result checked against per-element calls
+        self.batch_check_size = 4
     
     def load_from_code(self, code_string: str) -> Callable:
         """
@@ -56,6 +60,7 @@ class RewardFunctionLoader:
                 raise ValueError("Code must define a 'compute_reward' function")
             
             self.reward_func = namespace['compute_reward']
+            self.vectorizable = None
             return self.reward_func
             
         except Exception as e:
@@ -79,6 +84,47 @@ class RewardFunctionLoader:
         except Exception as e:
             warnings.warn(f"Reward computation failed: {str(e)}")
             return float('-inf')
+    
+    def compute_batch(self, predictions: Dict[str, np.ndarray], actual: Optional[Dict] = None,
+                      context: Optional[Dict] = None) -> np.ndarray:
+        """
+        Execute the reward function for a batch of predictions.
+        
+        predictions maps each target to an array of shape [n]. The function is
+        first called once with the arrays. The result is used only if it has one
+        reward per element and a few sampled elements match per-element calls;
+        otherwise (e.g. it branches on a scalar, or reduces across targets with
+        np.mean) it is called per element, and is not tried on arrays again.
+        """
+        if self.reward_func is None:
+            raise ValueError("No reward function loaded")
+        
+        n = len(next(iter(predictions.values()))) if predictions else 1
+        
+        def element(i):
+            return self.compute({k: v[i] for k, v in predictions.items()}, actual, context)
+        
+        if self.vectorizable is not False:
+            rewards = None
+            try:
+                with warnings.catch_warnings(), np.errstate(all='ignore'):
+                    warnings.simplefilter('ignore')
+                    rewards = np.asarray(self.reward_func(predictions, actual or {}, context or {}), dtype=float)
+            except Exception:
+                pass
+            if rewards is not None and rewards.shape == (n,):
+                check = np.unique(np.linspace(0, n - 1, min(n, self.batch_check_size)).astype(int))
+                expected = np.array([element(i) for i in check])
+                if np.allclose(rewards[check], expected, rtol=1e-6, atol=1e-9, equal_nan=True):
+                    self.vectorizable = True
+                    return rewards
+            self.vectorizable = False
+        return np.fromiter((element(i) for i in range(n)), dtype=float, count=n)
+
+
+def _policy_index(policy_feature_indices: List[int], n_params: int, device: str) -> torch.Tensor:
+    """Index tensor of the policy features that receive a parameter (the first n_params)."""
+    return torch.as_tensor(policy_feature_indices[:n_params], dtype=torch.long, device=device)
 
 
 class PolicyOptimizer:
@@ -87,6 +133,11 @@ class PolicyOptimizer:
     Uses the trained Transformer model(s) to predict outcomes and
     optimizes policy parameters to maximize the reward function.
     If models (list) is provided, predictions are averaged for uncertainty-aware optimization.
+    With autocast=True, forward passes run in BF16/FP16 on CUDA; on CPU the
+    Linear layers run as INT8 unless quantize=False. On CUDA, repeated forward
+    passes are replayed from captured CUDA graphs unless cuda_graphs=False.
+    Pass prepared=True when the model(s) already come from
+    prepare_inference_model with the same device, autocast and quantize.
     """
     
     def __init__(
@@ -94,19 +145,99 @@ class PolicyOptimizer:
         model: PanelTransformer,
         reward_loader: RewardFunctionLoader,
         device: str = 'cpu',
-        models: Optional[List[PanelTransformer]] = None
+        models: Optional[List[PanelTransformer]] = None,
+        autocast: bool = False,
+        max_batch_rows: int = 16384,
+        quantize: bool = True,
+        cuda_graphs: bool = True,
+        prepared: bool = False
     ):
-        self.model = model
-        self.model.to(device)
-        self.model.eval()
-        self.models = models  # Optional list for ensemble (predictions averaged)
-        if self.models:
-            for m in self.models:
-                m.to(device)
-                m.eval()
+        # With autocast on CUDA, weights are cast to BF16/FP16 as well as the activations;
+        # on CPU the Linear layers are quantized to INT8 instead
+        self.dtype = inference_dtype(device) if autocast else None
+        if prepared:
+            self.model = model
+            self.models = models or None
+        else:
+            self.model = prepare_inference_model(model, device, self.dtype, quantize)
+            self.models = None  # Optional list for ensemble (predictions averaged)
+            if models:
+                self.models = [self.model if m is model else prepare_inference_model(m, device, self.dtype, quantize)
+                               for m in models]
         self.device = device
+        self.autocast = autocast
+        self.max_batch_rows = max_batch_rows  # Upper bound on sequences per forward pass
         self.reward_loader = reward_loader
         self.optimization_history = []
+        # Device-side copies of the current run's fixed inputs (see _stage_inputs)
+        self._staged_source = None
+        self._base_X = None
+        self._entity_tensor = None
+        self._X_buffer = None
+        self._entity_buffer = None
+        self._pfi_source = None
+        self._pfi_index = None
+        # CUDA graphs of the forward pass over the input buffer, keyed by row count
+        self.cuda_graphs = cuda_graphs and device.startswith('cuda')
+        self.max_graphs = 4
+        self._graphs = {}
+    
+    def _stage_inputs(self, base_features: np.ndarray, entity_ids: np.ndarray):
+        """Copy the fixed inputs of an optimization run to the device once."""
+        self._staged_source = base_features
+        self._base_X = to_device(base_features, self.device, self.dtype or torch.float32)
+        self._entity_tensor = to_device(entity_ids, self.device, torch.long)
+        self._X_buffer = None
+        self._entity_buffer = None
+        self._graphs = {}
+    
+    def _forward(self, X: torch.Tensor, entity_tensor: torch.Tensor,
+                 cache_enabled: bool = True) -> torch.Tensor:
+        """
+        FP32 predictions on the device; for an ensemble, the member outputs are
+        averaged on the device so only one device-to-host copy follows.
+        """
+        with torch.inference_mode(), autocast_context(self.device, self.autocast, cache_enabled):
+            if not self.models:
+                predictions, _ = self.model(X, entity_tensor)
+                return predictions.float()
+            total = None
+            for m in self.models:
+                pred, _ = m(X, entity_tensor)
+                total = pred.float() if total is None else total + pred.float()
+            return total / len(self.models)
+    
+    def _graph_forward(self, X: torch.Tensor, entity_tensor: torch.Tensor) -> torch.Tensor:
+        """
+        _forward replayed from a CUDA graph captured on the (fixed-address) input
+        buffers, so a repeated call costs one graph launch instead of one launch
+        per kernel. The returned tensor is owned by the graph and is overwritten
+        by the next replay. Falls back to eager when capture fails.
+        """
+        n_rows = X.shape[0]
+        entry = self._graphs.get(n_rows)
+        if entry is None:
+            if len(self._graphs) >= self.max_graphs:
+                return self._forward(X, entity_tensor)
+            try:
+                # Warm up on a side stream (as required before capture), then capture
+                stream = torch.cuda.Stream()
+                stream.wait_stream(torch.cuda.current_stream())
+                with torch.cuda.stream(stream):
+                    for _ in range(3):
+                        self._forward(X, entity_tensor, cache_enabled=False)
+                torch.cuda.current_stream().wait_stream(stream)
+                graph = torch.cuda.CUDAGraph()
+                with torch.cuda.graph(graph):
+                    static_out = self._forward(X, entity_tensor, cache_enabled=False)
+            except Exception:
+                self.cuda_graphs = False
+                self._graphs = {}
+                return self._forward(X, entity_tensor)
+            entry = self._graphs[n_rows] = (graph, static_out)
+        graph, static_out = entry
+        graph.replay()
+        return static_out
     
     def _predict_with_params(
         self,
@@ -120,44 +251,97 @@ class PolicyOptimizer:
         Make predictions with modified policy parameters.
         If self.models is set, averages predictions over all models (ensemble).
         """
-        modified_features = base_features.copy()
-        for i, idx in enumerate(policy_feature_indices):
-            if i < len(policy_params):
-                modified_features[:, -1, idx] = policy_params[i]
-        X = torch.tensor(modified_features, dtype=torch.float32).to(self.device)
-        entity_tensor = torch.tensor(entity_ids, dtype=torch.long).to(self.device)
-        if self.models:
-            all_preds = []
-            with torch.no_grad():
-                for m in self.models:
-                    pred, _ = m(X, entity_tensor)
-                    all_preds.append(pred.cpu().numpy())
-            predictions = np.mean(all_preds, axis=0)
-        else:
-            with torch.no_grad():
-                predictions, _ = self.model(X, entity_tensor)
-                predictions = predictions.cpu().numpy()
-        result = {}
-        for i, name in enumerate(target_names):
-            if i < predictions.shape[-1]:
-                result[name] = float(predictions[:, :, i].mean())
-        return result
+        return self._predict_periods(
+            base_features, entity_ids, np.atleast_2d(policy_params),
+            policy_feature_indices, target_names
+        )[0]
     
-    def _objective_function(
+    def _predict_periods(
         self,
-        policy_params: np.ndarray,
         base_features: np.ndarray,
         entity_ids: np.ndarray,
+        period_params: np.ndarray,
         policy_feature_indices: List[int],
-        target_names: List[str],
+        target_names: List[str]
+    ) -> List[Dict[str, float]]:
+        """
+        Predict target means for several policy parameter sets in one forward pass.
+        
+        period_params has shape [n_sets, n_params]; base_features is tiled once per
+        set along the batch dimension so the model runs a single batched forward.
+        """
+        set_means = self._predict_means(base_features, entity_ids, period_params, policy_feature_indices)
+        
+        results = []
+        for s in range(set_means.shape[0]):
+            result = {}
+            for i, name in enumerate(target_names):
+                if i < set_means.shape[1]:
+                    result[name] = float(set_means[s, i])
+            results.append(result)
+        return results
+    
+    def _predict_means(
+        self,
+        base_features: np.ndarray,
+        entity_ids: np.ndarray,
+        period_params: np.ndarray,
+        policy_feature_indices: List[int]
+    ) -> np.ndarray:
+        """Per-target prediction means for each parameter set, as an [n_sets, n_targets] array."""
+        if base_features is not self._staged_source:
+            self._stage_inputs(base_features, entity_ids)
+        n_sets = period_params.shape[0]
+        
+        # Large batches (e.g. a whole vectorized DE generation) go through in chunks
+        sets_per_chunk = max(1, self.max_batch_rows // self._base_X.shape[0])
+        return np.concatenate([
+            self._predict_chunk(period_params[start:start + sets_per_chunk], policy_feature_indices)
+            for start in range(0, n_sets, sets_per_chunk)
+        ], axis=0)
+    
+    def _predict_chunk(
+        self,
+        param_sets: np.ndarray,
+        policy_feature_indices: List[int]
+    ) -> np.ndarray:
+        """Per-target prediction means for each parameter set, using the staged inputs."""
+        n_sets = param_sets.shape[0]
+        
+        # Reuse the device input buffer; grow it only when a larger chunk arrives
+        n_rows = n_sets * self._base_X.shape[0]
+        if self._X_buffer is None or self._X_buffer.shape[0] < n_rows:
+            self._X_buffer = torch.empty((n_rows, *self._base_X.shape[1:]),
+                                         dtype=self._base_X.dtype, device=self.device)
+            self._entity_buffer = self._entity_tensor.repeat(n_sets)
+            self._graphs = {}  # captured on the old buffers
+        X_flat = self._X_buffer[:n_rows]
+        X = X_flat.view(n_sets, *self._base_X.shape)
+        X.copy_(self._base_X.expand_as(X))
+        params = torch.as_tensor(param_sets, dtype=self._base_X.dtype, device=self.device)
+        # The index tensor is fixed for a run; rebuild it only when the feature list changes
+        if (policy_feature_indices is not self._pfi_source
+                or self._pfi_index.numel() != min(len(policy_feature_indices), params.shape[1])):
+            self._pfi_source = policy_feature_indices
+            self._pfi_index = _policy_index(policy_feature_indices, params.shape[1], self.device)
+        n_idx = self._pfi_index.numel()
+        X[:, :, -1, self._pfi_index] = params[:, None, :n_idx]
+        
+        if self.cuda_graphs:
+            predictions = self._graph_forward(X_flat, self._entity_buffer[:n_rows])
+        else:
+            predictions = self._forward(X_flat, self._entity_buffer[:n_rows])
+        # [n_sets * batch, horizon, n_targets] -> per-set means over batch and horizon,
+        # reduced on the device with a single transfer back
+        return predictions.view(n_sets, -1, predictions.shape[-1]).mean(dim=1).cpu().numpy()
+    
+    def _penalized_reward(
+        self,
+        predictions: Dict[str, float],
         context: Dict,
         constraints: Optional[List[Dict]] = None
     ) -> float:
-        """Objective function for optimization (negative reward for minimization)."""
-        predictions = self._predict_with_params(
-            base_features, entity_ids, policy_params,
-            policy_feature_indices, target_names
-        )
+        """Reward for one set of predictions, minus constraint penalties."""
         reward = self.reward_loader.compute(predictions, None, context)
         try:
             reward = float(reward)
@@ -176,12 +360,74 @@ class PolicyOptimizer:
                     reward -= 1000.0 * (pv - val)
                 elif typ == 'min' and pv < val:
                     reward -= 1000.0 * (val - pv)
-        self.optimization_history.append({
-            'params': policy_params.tolist(),
-            'predictions': {k: float(v) for k, v in predictions.items()},
-            'reward': float(reward)
-        })
-        return -reward  # Negative because we minimize
+        return reward
+    
+    def _penalized_rewards(
+        self,
+        predictions: Dict[str, np.ndarray],
+        context: Dict,
+        constraints: Optional[List[Dict]] = None
+    ) -> np.ndarray:
+        """Vectorized _penalized_reward for predictions given as arrays of shape [n]."""
+        rewards = self.reward_loader.compute_batch(predictions, None, context)
+        if constraints:
+            for c in constraints:
+                var = c.get('variable')
+                typ = c.get('type', 'max')
+                val = c.get('value')
+                if var not in predictions or val is None:
+                    continue
+                pv = predictions[var]
+                if typ == 'max':
+                    rewards = rewards - 1000.0 * np.maximum(pv - val, 0.0)
+                elif typ == 'min':
+                    rewards = rewards - 1000.0 * np.maximum(val - pv, 0.0)
+        return rewards
+    
+    def _objective_function(
+        self,
+        policy_params: np.ndarray,
+        base_features: np.ndarray,
+        entity_ids: np.ndarray,
+        policy_feature_indices: List[int],
+        target_names: List[str],
+        contexts: List[Dict],
+        constraints: Optional[List[Dict]] = None
+    ) -> Union[float, np.ndarray]:
+        """
+        Objective function for optimization (negative reward for minimization).
+        
+        policy_params holds one parameter block per context (period); the rewards
+        of all periods are summed. It is either a single candidate of shape [D]
+        or, for vectorized differential evolution, a batch of shape [D, S]; every
+        candidate and period is evaluated in one forward pass.
+        """
+        single = policy_params.ndim == 1
+        candidates = policy_params[np.newaxis] if single else policy_params.T  # [S, D]
+        n_candidates = candidates.shape[0]
+        n_periods = len(contexts)
+        means = self._predict_means(
+            base_features, entity_ids, candidates.reshape(n_candidates * n_periods, -1),
+            policy_feature_indices
+        ).reshape(n_candidates, n_periods, -1)
+        names = target_names[:means.shape[-1]]
+        
+        # One reward call per period over all candidates
+        rewards = np.zeros(n_candidates)
+        for t, context in enumerate(contexts):
+            predictions = {name: means[:, t, i] for i, name in enumerate(names)}
+            rewards += self._penalized_rewards(predictions, context, constraints)
+        
+        for c in range(n_candidates):
+            candidate_predictions = [{name: float(means[c, t, i]) for i, name in enumerate(names)}
+                                     for t in range(n_periods)]
+            self.optimization_history.append({
+                'params': candidates[c].tolist(),
+                'predictions': candidate_predictions[0] if n_periods == 1 else candidate_predictions,
+                'reward': float(rewards[c])
+            })
+        # Negative because we minimize
+        return -float(rewards[0]) if single else -rewards
     
     def optimize(
         self,
@@ -195,7 +441,8 @@ class PolicyOptimizer:
         method: str = 'differential_evolution',
         max_iterations: int = 100,
         context: Optional[Dict] = None,
-        constraints: Optional[List[Dict]] = None
+        constraints: Optional[List[Dict]] = None,
+        contexts: Optional[List[Dict]] = None
     ) -> Dict:
         """
         Find optimal policy parameters.
@@ -211,22 +458,25 @@ class PolicyOptimizer:
             method: Optimization method ('differential_evolution', 'L-BFGS-B', 'SLSQP')
             max_iterations: Maximum optimization iterations
             context: Additional context for reward function
+            contexts: One context per period; optimizes one parameter set per
+                period jointly, evaluating all periods in a single forward pass
             
         Returns:
-            Optimization results
+            Optimization results. With contexts, 'period_results' holds the
+            per-period results and the top-level fields describe the last period.
         """
         self.optimization_history = []
+        self._stage_inputs(base_features, entity_ids)
         
-        # Get indices of policy features
-        policy_feature_indices = []
-        for name in policy_feature_names:
-            if name in feature_names:
-                policy_feature_indices.append(feature_names.index(name))
+        # Get indices of policy features (first occurrence, as list.index would give)
+        name_to_idx = {name: i for i, name in reversed(list(enumerate(feature_names)))}
+        policy_feature_indices = [name_to_idx[name] for name in policy_feature_names if name in name_to_idx]
         
         if not policy_feature_indices:
             raise ValueError("No valid policy features found")
         
-        context = context or {}
+        contexts = contexts or [context or {}]
+        n_periods = len(contexts)
         n_params = len(policy_feature_indices)
         
         # Ensure bounds match number of parameters
@@ -237,27 +487,31 @@ class PolicyOptimizer:
         if initial_params is None:
             initial_params = np.array([(b[0] + b[1]) / 2 for b in bounds])
         
+        # One parameter block per period
+        bounds = list(bounds) * n_periods
+        initial_params = np.tile(initial_params, n_periods)
+        
         constraints = constraints or []
         if method == 'differential_evolution':
             result = differential_evolution(
                 func=lambda p: self._objective_function(
                     p, base_features, entity_ids, policy_feature_indices, target_names,
-                    context or {}, constraints
+                    contexts, constraints
                 ),
                 bounds=bounds,
                 maxiter=max_iterations,
                 seed=42,
-                workers=1,
+                vectorized=True,
+                updating='deferred',
                 polish=True
             )
             optimal_params = result.x
-            optimal_reward = -result.fun
             success = result.success
         else:
             result = minimize(
                 fun=lambda p: self._objective_function(
                     p, base_features, entity_ids, policy_feature_indices, target_names,
-                    context or {}, constraints
+                    contexts, constraints
                 ),
                 x0=initial_params,
                 method=method,
@@ -265,12 +519,12 @@ class PolicyOptimizer:
                 options={'maxiter': max_iterations}
             )
             optimal_params = result.x
-            optimal_reward = -result.fun
             success = result.success
         
-        # Get final predictions
-        final_predictions = self._predict_with_params(
-            base_features, entity_ids, optimal_params,
+        # Get final predictions for every period
+        optimal_period_params = np.reshape(optimal_params, (n_periods, n_params))
+        final_predictions = self._predict_periods(
+            base_features, entity_ids, optimal_period_params,
             policy_feature_indices, target_names
         )
         
@@ -281,17 +535,36 @@ class PolicyOptimizer:
             policy_feature_indices, target_names
         )
         
+        if n_periods == 1:
+            optimal_rewards = [-result.fun]
+        else:
+            optimal_rewards = [
+                self._penalized_reward(preds, ctx, constraints)
+                for preds, ctx in zip(final_predictions, contexts)
+            ]
+        
+        period_results = []
+        for t in range(n_periods):
+            period_results.append({
+                'optimal_params': {name: float(optimal_period_params[t, i])
+                                 for i, name in enumerate(policy_feature_names)},
+                'optimal_reward': float(optimal_rewards[t]),
+                'optimal_predictions': {k: float(v) for k, v in final_predictions[t].items()},
+                'improvement': {k: float(final_predictions[t][k] - baseline_predictions[k])
+                              for k in final_predictions[t]}
+            })
+        last = period_results[-1]
+        
         return {
-            'optimal_params': {name: float(optimal_params[i]) 
-                             for i, name in enumerate(policy_feature_names)},
-            'optimal_reward': float(optimal_reward),
+            'optimal_params': last['optimal_params'],
+            'optimal_reward': last['optimal_reward'],
             'baseline_predictions': {k: float(v) for k, v in baseline_predictions.items()},
-            'optimal_predictions': {k: float(v) for k, v in final_predictions.items()},
-            'improvement': {k: float(final_predictions[k] - baseline_predictions[k]) 
-                          for k in final_predictions},
+            'optimal_predictions': last['optimal_predictions'],
+            'improvement': last['improvement'],
             'success': success,
             'iterations': len(self.optimization_history),
-            'history': self.optimization_history[-100:]  # Last 100 iterations
+            'history': self.optimization_history[-100:],  # Last 100 iterations
+            'period_results': period_results
         }
     
     def scenario_analysis(
@@ -316,23 +589,33 @@ class PolicyOptimizer:
             Analysis results for each scenario
         """
         results = {}
+        if not scenarios:
+            return results
         
+        # First index of each name, as list.index would give
+        name_to_idx = {name: i for i, name in reversed(list(enumerate(feature_names)))}
+        
+        # Build every scenario's inputs, then run them through the model as one batch
+        modified_list = []
         for scenario_name, modifications in scenarios.items():
             modified_features = base_features.copy()
             
             for feature_name, value in modifications.items():
-                if feature_name in feature_names:
-                    idx = feature_names.index(feature_name)
+                idx = name_to_idx.get(feature_name)
+                if idx is not None:
                     modified_features[:, -1, idx] = value
-            
-            # Predict
-            X = torch.tensor(modified_features, dtype=torch.float32).to(self.device)
-            entity_tensor = torch.tensor(entity_ids, dtype=torch.long).to(self.device)
-            
-            with torch.no_grad():
-                predictions, attention = self.model(X, entity_tensor, return_attention=True)
-                predictions = predictions.cpu().numpy()
-            
+            modified_list.append(modified_features)
+        
+        n_scenarios = len(modified_list)
+        X = to_device(np.concatenate(modified_list, axis=0), self.device, self.dtype or torch.float32)
+        entity_tensor = to_device(np.tile(entity_ids, n_scenarios), self.device, torch.long)
+        
+        with torch.inference_mode(), autocast_context(self.device, self.autocast):
+            all_predictions, _ = self.model(X, entity_tensor)
+            all_predictions = all_predictions.float().cpu().numpy()
+        all_predictions = all_predictions.reshape(n_scenarios, len(base_features), *all_predictions.shape[1:])
+        
+        for (scenario_name, modifications), predictions in zip(scenarios.items(), all_predictions):
             # Format predictions
             scenario_predictions = {}
             for i, name in enumerate(target_names):
@@ -368,14 +651,23 @@ class EvolutionaryOptimizer:
         model: PanelTransformer,
         reward_loader: RewardFunctionLoader,
         population_size: int = 50,
-        device: str = 'cpu'
+        device: str = 'cpu',
+        autocast: bool = False,
+        seed: Optional[int] = None
     ):
-        self.model = model
-        self.model.to(device)
-        self.model.eval()
+        self.rng = np.random.default_rng(seed)
+        self.dtype = inference_dtype(device) if autocast else None
+        self.model = prepare_inference_model(model, device, self.dtype)
         self.device = device
+        self.autocast = autocast
         self.reward_loader = reward_loader
         self.population_size = population_size
+        # Device-side copies of the current run's fixed inputs
+        self._staged_source = None
+        self._base_X = None
+        self._entity_tensor = None
+        self._pfi_source = None
+        self._pfi_index = None
     
     def optimize(
         self,
@@ -401,29 +693,24 @@ class EvolutionaryOptimizer:
         """
         n_params = len(policy_feature_indices)
         context = context or {}
+        pop_size = self.population_size
+        lows = np.array([b[0] for b in bounds], dtype=float)
+        highs = np.array([b[1] for b in bounds], dtype=float)
+        n_pairs = pop_size // 2
         
         # Initialize population
-        population = np.random.uniform(
-            low=[b[0] for b in bounds],
-            high=[b[1] for b in bounds],
-            size=(self.population_size, n_params)
-        )
+        population = self.rng.uniform(lows, highs, size=(pop_size, n_params))
         
         best_individual = None
         best_fitness = float('-inf')
         history = []
         
         for gen in range(generations):
-            # Evaluate fitness
-            fitness_scores = []
-            for individual in population:
-                fitness = self._evaluate_fitness(
-                    individual, base_features, entity_ids,
-                    policy_feature_indices, target_names, context
-                )
-                fitness_scores.append(fitness)
-            
-            fitness_scores = np.array(fitness_scores)
+            # Evaluate fitness of the whole population in one forward pass
+            fitness_scores = self._evaluate_population(
+                population, base_features, entity_ids,
+                policy_feature_indices, target_names, context
+            )
             
             # Track best
             gen_best_idx = np.argmax(fitness_scores)
@@ -438,29 +725,25 @@ class EvolutionaryOptimizer:
                 'std_fitness': float(np.std(fitness_scores))
             })
             
-            # Selection (tournament)
-            new_population = []
-            for _ in range(self.population_size):
-                # Tournament selection
-                idx1, idx2 = np.random.choice(self.population_size, 2, replace=False)
-                winner_idx = idx1 if fitness_scores[idx1] > fitness_scores[idx2] else idx2
-                new_population.append(population[winner_idx].copy())
-            
-            population = np.array(new_population)
+            # Selection (tournament between two distinct individuals)
+            idx1 = self.rng.integers(0, pop_size, pop_size)
+            idx2 = (idx1 + self.rng.integers(1, pop_size, pop_size)) % pop_size
+            winners = np.where(fitness_scores[idx1] > fitness_scores[idx2], idx1, idx2)
+            population = population[winners]
             
-            # Crossover
-            for i in range(0, self.population_size - 1, 2):
-                if np.random.random() < crossover_rate:
-                    # Single point crossover
-                    point = np.random.randint(1, n_params)
-                    population[i, point:], population[i+1, point:] = \
-                        population[i+1, point:].copy(), population[i, point:].copy()
+            # Single point crossover of consecutive pairs: swap the tails past each point
+            if n_params > 1 and n_pairs > 0:
+                first = population[0:2 * n_pairs:2]
+                second = population[1:2 * n_pairs:2]
+                do_cross = self.rng.random(n_pairs) < crossover_rate
+                points = self.rng.integers(1, n_params, n_pairs)
+                swap = do_cross[:, None] & (np.arange(n_params) >= points[:, None])
+                population[0:2 * n_pairs:2], population[1:2 * n_pairs:2] = \
+                    np.where(swap, second, first), np.where(swap, first, second)
             
-            # Mutation
-            for i in range(self.population_size):
-                for j in range(n_params):
-                    if np.random.random() < mutation_rate:
-                        population[i, j] = np.random.uniform(bounds[j][0], bounds[j][1])
+            # Mutation: resample genes uniformly within their bounds
+            mutate = self.rng.random((pop_size, n_params)) < mutation_rate
+            population = np.where(mutate, self.rng.uniform(lows, highs, size=(pop_size, n_params)), population)
             
             # Elitism: keep best individual
             population[0] = best_individual
@@ -472,34 +755,42 @@ class EvolutionaryOptimizer:
             'history': history
         }
     
-    def _evaluate_fitness(
+    def _evaluate_population(
         self,
-        params: np.ndarray,
+        population: np.ndarray,
         base_features: np.ndarray,
         entity_ids: np.ndarray,
         policy_feature_indices: List[int],
         target_names: List[str],
         context: Dict
-    ) -> float:
-        """Evaluate fitness of an individual."""
-        # Modify features
-        modified_features = base_features.copy()
-        for i, idx in enumerate(policy_feature_indices):
-            modified_features[:, -1, idx] = params[i]
+    ) -> np.ndarray:
+        """Evaluate the fitness of every individual with a single batched forward."""
+        n_individuals = population.shape[0]
+        if base_features is not self._staged_source:
+            self._staged_source = base_features
+            self._base_X = to_device(base_features, self.device, self.dtype or torch.float32)
+            self._entity_tensor = to_device(entity_ids, self.device, torch.long)
         
-        # Predict
-        X = torch.tensor(modified_features, dtype=torch.float32).to(self.device)
-        entity_tensor = torch.tensor(entity_ids, dtype=torch.long).to(self.device)
+        # Modify features on the device: one copy of the batch per individual
+        X = self._base_X.unsqueeze(0).repeat(n_individuals, 1, 1, 1)
+        params = torch.as_tensor(population, dtype=X.dtype, device=self.device)
+        if (policy_feature_indices is not self._pfi_source
+                or self._pfi_index.numel() != min(len(policy_feature_indices), params.shape[1])):
+            self._pfi_source = policy_feature_indices
+            self._pfi_index = _policy_index(policy_feature_indices, params.shape[1], self.device)
+        X[:, :, -1, self._pfi_index] = params[:, None, :self._pfi_index.numel()]
+        X = X.view(-1, *self._base_X.shape[1:])
+        entity_tensor = self._entity_tensor.repeat(n_individuals)
         
-        with torch.no_grad():
+        # Predict
+        with torch.inference_mode(), autocast_context(self.device, self.autocast):
             predictions, _ = self.model(X, entity_tensor)
-            predictions = predictions.cpu().numpy()
+            predictions = predictions.float().cpu().numpy()
         
-        # Format predictions
-        pred_dict = {}
-        for i, name in enumerate(target_names):
-            if i < predictions.shape[-1]:
-                pred_dict[name] = predictions[:, :, i].mean()
+        # Per-individual means over batch and horizon: [n_individuals, n_targets]
+        target_means = predictions.reshape(n_individuals, -1, predictions.shape[-1]).mean(axis=1)
         
-        # Compute reward
-        return self.reward_loader.compute(pred_dict, None, context)
+        # Compute rewards for the whole population in one call
+        pred_arrays = {name: target_means[:, i] for i, name in enumerate(target_names)
+                       if i < target_means.shape[-1]}
+        return self.reward_loader.compute_batch(pred_arrays, None, context)
@@ -11,9 +11,31 @@ import numpy as np
 from typing import Dict, List, Optional, Tuple, Callable
 import time
 import json
+import os
+import contextlib
 
-from model import PanelTransformer
-from data_processor import create_batches
+from model import PanelTransformer, autocast_context, inference_dtype
+
+
+# NVTX ranges for Nsight Systems, enabled with AI4E_NVTX=1
+_NVTX = bool(os.environ.get('AI4E_NVTX')) and torch.cuda.is_available()
+
+
+def _nvtx_push(name: str):
+    if _NVTX:
+        torch.cuda.nvtx.range_push(name)
+
+
+def _nvtx_pop():
+    if _NVTX:
+        torch.cuda.nvtx.range_pop()
+
+
+def _grad_scaler(enabled: bool):
+    """CUDA GradScaler; torch.amp.GradScaler on torch>=2.3, torch.cuda.amp.GradScaler before."""
+    if hasattr(torch.amp, 'GradScaler'):
+        return torch.amp.GradScaler('cuda', enabled=enabled)
+    return torch.cuda.amp.GradScaler(enabled=enabled)
 
 
 class PolicyTrainer:
@@ -25,18 +47,49 @@ class PolicyTrainer:
         learning_rate: float = 1e-4,
         weight_decay: float = 1e-5,
         device: str = 'cpu',
-        scheduler_type: str = 'plateau'
+        scheduler_type: str = 'plateau',
+        use_amp: bool = False,
+        accumulation_steps: int = 1,
+        compile_model: bool = True
     ):
         self.model = model
         self.device = device
         self.model.to(device)
+        # Uncompiled module, used for state dicts and config
+        self._orig_model = model
+        self.compiled = False
+        self._dynamo = None
+        if compile_model and device.startswith('cuda') and hasattr(torch, 'compile'):
+            try:
+                import torch._dynamo as _dynamo
+                self.model = torch.compile(model, mode='reduce-overhead', fullgraph=False)
+                self._dynamo = _dynamo
+                self.compiled = True
+            except Exception:
+                self.model = model
+        self.accumulation_steps = max(1, int(accumulation_steps))  # micro-batches per optimizer step
         
-        # Optimizer
-        self.optimizer = optim.AdamW(
-            model.parameters(),
-            lr=learning_rate,
-            weight_decay=weight_decay
-        )
+        # Mixed precision on CUDA: BF16 where supported, else FP16 with loss scaling
+        self.amp_dtype = inference_dtype(device) if use_amp else None
+        self._autocast_device = 'cuda' if device.startswith('cuda') else 'cpu'
+        self.scaler = _grad_scaler(self.amp_dtype == torch.float16)
+        
+        # Optimizer: fused CUDA kernel on GPU, multi-tensor (foreach) updates otherwise
+        # (the two options are mutually exclusive; older torch versions lack `fused`)
+        impl = {'fused': True} if device.startswith('cuda') else {'foreach': True}
+        try:
+            self.optimizer = optim.AdamW(
+                model.parameters(),
+                lr=learning_rate,
+                weight_decay=weight_decay,
+                **impl
+            )
+        except (TypeError, RuntimeError, ValueError):
+            self.optimizer = optim.AdamW(
+                model.parameters(),
+                lr=learning_rate,
+                weight_decay=weight_decay
+            )
         
         # Learning rate scheduler
         if scheduler_type == 'plateau':
@@ -63,6 +116,140 @@ class PolicyTrainer:
         # Best model tracking
         self.best_val_loss = float('inf')
         self.best_model_state = None
+        
+        # Pinned gather buffers for _device_batches, kept for the length of a train() call
+        self._staging = None
+    
+    @contextlib.contextmanager
+    def _autocast(self):
+        """
+        Autocast context for forward passes; disabled when AMP is off.
+        
+        For a compiled model, compilation errors raised inside the context fall
+        back to eager execution (scoped here rather than set process-wide).
+        """
+        with contextlib.ExitStack() as stack:
+            if self._dynamo is not None:
+                stack.enter_context(self._dynamo.config.patch(suppress_errors=True))
+            stack.enter_context(torch.autocast(device_type=self._autocast_device, dtype=self.amp_dtype,
+                                               enabled=self.amp_dtype is not None))
+            yield
+    
+    def _as_tensors(
+        self,
+        X: np.ndarray,
+        y: np.ndarray,
+        entity_ids: np.ndarray
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """
+        Wrap a split's arrays as CPU tensors once (zero-copy where the dtype
+        already matches), pinned when training on CUDA. Tensors pass through.
+        """
+        if isinstance(X, torch.Tensor):
+            return X, y, entity_ids
+        tensors = (
+            torch.from_numpy(np.ascontiguousarray(X, dtype=np.float32)),
+            torch.from_numpy(np.ascontiguousarray(y, dtype=np.float32)),
+            torch.from_numpy(np.ascontiguousarray(entity_ids, dtype=np.int64))
+        )
+        if self.device.startswith('cuda'):
+            tensors = tuple(t.pin_memory() for t in tensors)
+        return tensors
+    
+    def _save_best_state(self):
+        """
+        Copy the current weights into best_model_state on the CPU.
+        
+        The CPU tensors (pinned on CUDA) are allocated on the first call and
+        refilled afterwards; all copies are queued without blocking and
+        synchronized once.
+        """
+        state = self._orig_model.state_dict()
+        if self.best_model_state is None or self.best_model_state.keys() != state.keys():
+            pin = self.device.startswith('cuda')
+            self.best_model_state = {
+                k: torch.empty(v.shape, dtype=v.dtype, pin_memory=pin) for k, v in state.items()
+            }
+        for k, v in state.items():
+            self.best_model_state[k].copy_(v, non_blocking=True)
+        if self.device.startswith('cuda'):
+            torch.cuda.synchronize()
+    
+    def _optimizer_step(self):
+        """Clip the accumulated gradients, step the optimizer and clear the gradients."""
+        _nvtx_push('optim_step')
+        # Gradient clipping on the unscaled gradients
+        self.scaler.unscale_(self.optimizer)
+        torch.nn.utils.clip_grad_norm_(self._orig_model.parameters(), max_norm=1.0)
+        
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        self.optimizer.zero_grad(set_to_none=True)
+        _nvtx_pop()
+    
+    @staticmethod
+    def _new_staging() -> Dict:
+        """Side stream plus two (lazily allocated) pinned buffer slots for _device_batches."""
+        return {'stream': torch.cuda.Stream(), 'buffers': [None, None], 'copied': [None, None]}
+    
+    def _device_batches(self, tensors, batches):
+        """
+        Yield the rows of each batch of the CPU tensors, moved to the device.
+        
+        batches yields index tensors (gathered rows) or slices (views). On CUDA
+        the next batch is gathered into one of two pinned buffers and copied on
+        a side stream while the current batch is being computed. Inside train()
+        the buffers are allocated once and reused across epochs.
+        """
+        if not self.device.startswith('cuda'):
+            for rows in batches:
+                yield tuple(t[rows].to(self.device) for t in tensors)
+            return
+        
+        staging = self._staging or self._new_staging()
+        stream, buffers, copied = staging['stream'], staging['buffers'], staging['copied']
+        
+        def load(slot, rows):
+            if isinstance(rows, slice):
+                # Slices of the pinned split are already pinned
+                host = [t[rows] for t in tensors]
+            else:
+                if copied[slot] is not None:
+                    # The buffer's previous batch must have left the host
+                    copied[slot].synchronize()
+                if buffers[slot] is None or buffers[slot][0].shape[0] < len(rows):
+                    buffers[slot] = [
+                        torch.empty((len(rows),) + tuple(t.shape[1:]), dtype=t.dtype, pin_memory=True)
+                        for t in tensors
+                    ]
+                host = [torch.index_select(t, 0, rows, out=buf[:len(rows)])
+                        for t, buf in zip(tensors, buffers[slot])]
+            with torch.cuda.stream(stream):
+                out = tuple(h.to(self.device, non_blocking=True) for h in host)
+                event = torch.cuda.Event()
+                event.record(stream)
+            copied[slot] = event
+            return out, event
+        
+        def ready(loaded):
+            out, event = loaded
+            current = torch.cuda.current_stream()
+            current.wait_event(event)
+            for t in out:
+                # Allocated on the side stream, used on the current one
+                t.record_stream(current)
+            return out
+        
+        slot = 0
+        pending = None
+        for rows in batches:
+            loaded = load(slot, rows)
+            slot ^= 1
+            if pending is not None:
+                yield ready(pending)
+            pending = loaded
+        if pending is not None:
+            yield ready(pending)
     
     def train_epoch(
         self,
@@ -71,38 +258,65 @@ class PolicyTrainer:
         entity_train: np.ndarray,
         batch_size: int
     ) -> float:
-        """Train for one epoch."""
+        """
+        Train for one epoch.
+        
+        Gradients are accumulated over accumulation_steps micro-batches per
+        optimizer step (fewer in a final partial window, which is averaged over
+        its own size); the returned loss is the mean per micro-batch.
+        """
+        _nvtx_push('train_epoch')
         self.model.train()
-        total_loss = 0.0
+        # Summed on the device and read back once, so batches do not wait on a sync
+        total_loss = torch.zeros((), device=self.device)
         n_batches = 0
         
-        batches = create_batches(X_train, y_train, entity_train, batch_size)
+        X_train, y_train, entity_train = self._as_tensors(X_train, y_train, entity_train)
+        n_samples = X_train.shape[0]
+        # Shuffle once per epoch; each batch gathers its rows by index
+        perm = torch.randperm(n_samples)
+        n_used = n_samples
+        if self.compiled and n_samples > batch_size:
+            # Keep batch shapes fixed so the compiled graph is not recompiled
+            n_used = n_samples - n_samples % batch_size
+        self.optimizer.zero_grad(set_to_none=True)
         
-        for X_batch, y_batch, entity_batch in batches:
-            # Convert to tensors
-            X = torch.tensor(X_batch, dtype=torch.float32).to(self.device)
-            y = torch.tensor(y_batch, dtype=torch.float32).to(self.device)
-            entity_ids = torch.tensor(entity_batch, dtype=torch.long).to(self.device)
-            
+        # Micro-batches before the final partial accumulation window, and its size
+        n_total = -(-n_used // batch_size)
+        n_full = n_total - n_total % self.accumulation_steps
+        tail_steps = n_total - n_full
+        
+        batches = (perm[start:start + batch_size] for start in range(0, n_used, batch_size))
+        for X, y, entity_ids in self._device_batches((X_train, y_train, entity_train), batches):
+            _nvtx_push('train_batch')
             # Forward pass
-            self.optimizer.zero_grad()
-            predictions, _ = self.model(X, entity_ids)
-            
-            # Compute loss
-            loss = self.criterion(predictions, y)
-            
-            # Backward pass
-            loss.backward()
-            
-            # Gradient clipping
-            torch.nn.utils.clip_grad_norm_(self.model.parameters(), max_norm=1.0)
+            _nvtx_push('forward')
+            with self._autocast():
+                predictions, _ = self.model(X, entity_ids)
+                
+                # Compute loss
+                loss = self.criterion(predictions.float(), y)
+            _nvtx_pop()
             
-            self.optimizer.step()
+            # Backward pass (loss scaling is a no-op unless training in FP16)
+            _nvtx_push('backward')
+            window = self.accumulation_steps if n_batches < n_full else tail_steps
+            self.scaler.scale(loss / window).backward()
+            _nvtx_pop()
             
-            total_loss += loss.item()
+            total_loss += loss.detach()
             n_batches += 1
+            
+            if n_batches % self.accumulation_steps == 0:
+                self._optimizer_step()
+            _nvtx_pop()
         
-        return total_loss / n_batches
+        # Flush gradients left over from a final partial accumulation window
+        if n_batches % self.accumulation_steps != 0:
+            self._optimizer_step()
+        
+        _nvtx_pop()
+        return total_loss.item() / n_batches
     
     def validate(
         self,
@@ -111,42 +325,83 @@ class PolicyTrainer:
         entity_val: np.ndarray,
         batch_size: int
     ) -> Tuple[float, Dict]:
-        """Validate the model."""
+        """
+        Validate the model.
+        
+        On CUDA the metrics are accumulated as running sums on the device and
+        read back once; on CPU predictions are written into a preallocated
+        array for _compute_metrics.
+        """
+        _nvtx_push('validate')
         self.model.eval()
-        total_loss = 0.0
+        total_loss = torch.zeros((), device=self.device)
         n_batches = 0
         
-        all_predictions = []
-        all_targets = []
+        device_metrics = self.device.startswith('cuda')
+        # Running sums: squared error, absolute error, y, y^2, |error / y| and count where |y| > 1e-8
+        metric_sums = torch.zeros(6, dtype=torch.float64, device=self.device) if device_metrics else None
+        n_values = 0
+        
+        X_val, y_val, entity_val = self._as_tensors(X_val, y_val, entity_val)
+        # CPU path: batches are written into one preallocated array in order
+        predictions_out = None if device_metrics else np.empty(tuple(y_val.shape), dtype=np.float32)
         
         with torch.no_grad():
-            batches = create_batches(X_val, y_val, entity_val, batch_size)
-            
-            for X_batch, y_batch, entity_batch in batches:
-                X = torch.tensor(X_batch, dtype=torch.float32).to(self.device)
-                y = torch.tensor(y_batch, dtype=torch.float32).to(self.device)
-                entity_ids = torch.tensor(entity_batch, dtype=torch.long).to(self.device)
-                
-                predictions, _ = self.model(X, entity_ids)
+            # Order does not matter here: contiguous slices are views of the (pinned) tensors
+            batches = (slice(start, start + batch_size) for start in range(0, X_val.shape[0], batch_size))
+            offset = 0
+            for X, y, entity_ids in self._device_batches((X_val, y_val, entity_val), batches):
+                with self._autocast():
+                    predictions, _ = self.model(X, entity_ids)
+                predictions = predictions.float()
                 loss = self.criterion(predictions, y)
                 
-                total_loss += loss.item()
+                total_loss += loss
                 n_batches += 1
                 
-                all_predictions.append(predictions.cpu().numpy())
-                all_targets.append(y_batch)
+                if device_metrics:
+                    err = predictions - y
+                    mask = y.abs() > 1e-8
+                    metric_sums += torch.stack([
+                        err.square().sum(dtype=torch.float64),
+                        err.abs().sum(dtype=torch.float64),
+                        y.sum(dtype=torch.float64),
+                        y.square().sum(dtype=torch.float64),
+                        torch.where(mask, (err / y).abs(), torch.zeros_like(err)).sum(dtype=torch.float64),
+                        mask.sum(dtype=torch.float64)
+                    ])
+                    n_values += y.numel()
+                else:
+                    predictions_out[offset:offset + y.shape[0]] = predictions.cpu().numpy()
+                offset += y.shape[0]
         
-        avg_loss = total_loss / n_batches
+        avg_loss = total_loss.item() / n_batches
         
         # Compute additional metrics
-        predictions = np.concatenate(all_predictions, axis=0)
-        targets = np.concatenate(all_targets, axis=0)
-        
-        metrics = self._compute_metrics(predictions, targets)
+        if device_metrics:
+            metrics = self._metrics_from_sums(metric_sums.tolist(), n_values)
+        else:
+            # The targets are the validation split itself; no per-batch copy is needed
+            metrics = self._compute_metrics(predictions_out, y_val.numpy())
         metrics['loss'] = avg_loss
         
+        _nvtx_pop()
         return avg_loss, metrics
     
+    @staticmethod
+    def _metrics_from_sums(sums: List[float], n: int) -> Dict:
+        """The metrics of _compute_metrics from validate's running sums over n values."""
+        sse, sae, sum_y, sum_y2, sum_ape, n_ape = sums
+        mse = sse / n
+        ss_tot = sum_y2 - sum_y * sum_y / n
+        return {
+            'mse': float(mse),
+            'rmse': float(np.sqrt(mse)),
+            'mae': float(sae / n),
+            'r2': float(1 - sse / (ss_tot + 1e-8)),
+            'mape': float(sum_ape / n_ape * 100) if n_ape > 0 else 0.0
+        }
+    
     def _compute_metrics(self, predictions: np.ndarray, targets: np.ndarray) -> Dict:
         """Compute evaluation metrics."""
         # Flatten for overall metrics
@@ -169,8 +424,12 @@ class PolicyTrainer:
         
         # MAPE (Mean Absolute Percentage Error)
         mask = np.abs(target_flat) > 1e-8
-        if np.any(mask):
-            mape = np.mean(np.abs((target_flat[mask] - pred_flat[mask]) / target_flat[mask])) * 100
+        n_mask = np.count_nonzero(mask)
+        if n_mask:
+            # Masked division into one buffer instead of gathering the masked values
+            err = np.subtract(target_flat, pred_flat)
+            np.divide(err, target_flat, out=err, where=mask)
+            mape = np.abs(err, out=err).sum(where=mask) / n_mask * 100
         else:
             mape = 0.0
         
@@ -188,7 +447,8 @@ class PolicyTrainer:
         epochs: int = 100,
         batch_size: int = 32,
         early_stopping_patience: int = 15,
-        callback: Optional[Callable] = None
+        callback: Optional[Callable] = None,
+        accumulation_steps: Optional[int] = None
     ) -> Dict:
         """
         Full training loop.
@@ -199,24 +459,30 @@ class PolicyTrainer:
             batch_size: Batch size
             early_stopping_patience: Patience for early stopping
             callback: Optional callback function called after each epoch
+            accumulation_steps: Micro-batches per optimizer step (overrides the
+                value given to the constructor)
             
         Returns:
             Training history and best metrics
         """
+        if accumulation_steps is not None:
+            self.accumulation_steps = max(1, int(accumulation_steps))
         patience_counter = 0
         
+        # Convert each split to (pinned) tensors once instead of once per batch
+        train_split = self._as_tensors(data['X_train'], data['y_train'], data['entity_train'])
+        val_split = self._as_tensors(data['X_val'], data['y_val'], data['entity_val'])
+        if self.device.startswith('cuda'):
+            self._staging = self._new_staging()
+        
         for epoch in range(epochs):
             start_time = time.time()
             
             # Training
-            train_loss = self.train_epoch(
-                data['X_train'], data['y_train'], data['entity_train'], batch_size
-            )
+            train_loss = self.train_epoch(*train_split, batch_size)
             
             # Validation
-            val_loss, val_metrics = self.validate(
-                data['X_val'], data['y_val'], data['entity_val'], batch_size
-            )
+            val_loss, val_metrics = self.validate(*val_split, batch_size)
             
             epoch_time = time.time() - start_time
             
@@ -237,7 +503,7 @@ class PolicyTrainer:
             # Check for best model
             if val_loss < self.best_val_loss:
                 self.best_val_loss = val_loss
-                self.best_model_state = {k: v.cpu().clone() for k, v in self.model.state_dict().items()}
+                self._save_best_state()
                 patience_counter = 0
             else:
                 patience_counter += 1
@@ -261,12 +527,14 @@ class PolicyTrainer:
         
         # Restore best model
         if self.best_model_state:
-            self.model.load_state_dict(self.best_model_state)
+            self._orig_model.load_state_dict(self.best_model_state)
         
         # Final evaluation on test set
         test_loss, test_metrics = self.validate(
             data['X_test'], data['y_test'], data['entity_test'], batch_size
         )
+        # Release the pinned buffers
+        self._staging = None
         
         return {
             'history': self.history,
@@ -278,8 +546,8 @@ class PolicyTrainer:
     def save_checkpoint(self, path: str, data_params: Dict = None):
         """Save model checkpoint."""
         checkpoint = {
-            'model_state_dict': self.model.state_dict(),
-            'model_config': self.model.get_config(),
+            'model_state_dict': self._orig_model.state_dict(),
+            'model_config': self._orig_model.get_config(),
             'optimizer_state_dict': self.optimizer.state_dict(),
             'history': self.history,
             'best_val_loss': self.best_val_loss
@@ -291,7 +559,7 @@ class PolicyTrainer:
     def load_checkpoint(self, path: str) -> Dict:
         """Load model checkpoint."""
         checkpoint = torch.load(path, map_location=self.device)
-        self.model.load_state_dict(checkpoint['model_state_dict'])
+        self._orig_model.load_state_dict(checkpoint['model_state_dict'])
         self.optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
         self.history = checkpoint.get('history', self.history)
         self.best_val_loss = checkpoint.get('best_val_loss', float('inf'))
@@ -303,17 +571,24 @@ def compute_feature_importance(
     X: np.ndarray,
     entity_ids: np.ndarray,
     feature_names: List[str],
-    device: str = 'cpu'
+    device: str = 'cpu',
+    max_batch_rows: int = 16384
 ) -> Dict[str, float]:
     """
     Compute feature importance using permutation importance.
     
+    The permuted copies for several features are stacked along the batch
+    dimension and scored in one forward pass (at most max_batch_rows rows).
+    On CUDA the forward passes run under BF16 (FP16 without BF16 support)
+    autocast; predictions are compared in FP32.
+    
     Args:
         model: Trained model
         X: Input data [batch, lookback, n_features]
         entity_ids: Entity IDs
         feature_names: List of feature names
         device: Device to use
+        max_batch_rows: Upper bound on sequences per forward pass
         
     Returns:
         Dictionary mapping feature names to importance scores
@@ -321,33 +596,46 @@ def compute_feature_importance(
     model.eval()
     model.to(device)
     
-    X_tensor = torch.tensor(X, dtype=torch.float32).to(device)
-    entity_tensor = torch.tensor(entity_ids, dtype=torch.long).to(device)
+    # Wrap the (contiguous) arrays without a copy; the only copy is the transfer to the device
+    X_tensor = torch.from_numpy(np.ascontiguousarray(X, dtype=np.float32)).to(device)
+    entity_tensor = torch.from_numpy(np.ascontiguousarray(entity_ids, dtype=np.int64)).to(device)
+    n_samples = X.shape[0]
+    if not feature_names:
+        return {}
     
     # Get baseline predictions
-    with torch.no_grad():
+    with torch.no_grad(), autocast_context(device):
         baseline_pred, _ = model(X_tensor, entity_tensor)
-        baseline_pred = baseline_pred.cpu().numpy()
+    baseline_pred = baseline_pred.float()
     
-    importance_scores = {}
+    # One permutation per feature, drawn in feature order
+    permutations = torch.as_tensor(
+        np.stack([np.random.permutation(n_samples) for _ in feature_names]), device=device
+    )
     
-    for i, feature_name in enumerate(feature_names):
-        # Permute feature i
-        X_permuted = X.copy()
-        permuted_indices = np.random.permutation(X.shape[0])
-        X_permuted[:, :, i] = X[permuted_indices, :, i]
+    features_per_chunk = max(1, max_batch_rows // max(1, n_samples))
+    errors = []
+    for start in range(0, len(feature_names), features_per_chunk):
+        feature_idx = range(start, min(start + features_per_chunk, len(feature_names)))
+        n_chunk = len(feature_idx)
         
-        X_permuted_tensor = torch.tensor(X_permuted, dtype=torch.float32).to(device)
+        # Copy j of the batch has feature feature_idx[j] permuted across samples
+        X_permuted = X_tensor.unsqueeze(0).repeat(n_chunk, 1, 1, 1)
+        for j, i in enumerate(feature_idx):
+            X_permuted[j, :, :, i] = X_tensor[permutations[i], :, i]
         
         with torch.no_grad():
-            permuted_pred, _ = model(X_permuted_tensor, entity_tensor)
-            permuted_pred = permuted_pred.cpu().numpy()
-        
-        # Compute importance as increase in error
-        baseline_error = np.mean((baseline_pred) ** 2)
-        permuted_error = np.mean((permuted_pred - baseline_pred) ** 2)
-        
-        importance_scores[feature_name] = float(permuted_error)
+            with autocast_context(device):
+                permuted_pred, _ = model(X_permuted.view(-1, *X_tensor.shape[1:]), entity_tensor.repeat(n_chunk))
+            permuted_pred = permuted_pred.float().view(n_chunk, *baseline_pred.shape)
+            
+            # Importance as the mean squared change in predictions
+            errors.append(((permuted_pred - baseline_pred.unsqueeze(0)) ** 2)
+                          .flatten(start_dim=1).mean(dim=1).cpu().numpy())
+    
+    importance_scores = {}
+    for feature_name, error in zip(feature_names, np.concatenate(errors)):
+        importance_scores[feature_name] = float(error)
     
     # Normalize
     total = sum(importance_scores.values()) + 1e-8
@@ -14,11 +14,33 @@ warnings.filterwarnings('ignore')
 import pandas as pd
 import numpy as np
 import statsmodels.api as sm
+from types import SimpleNamespace
+from scipy import stats
+from scipy.linalg import cho_factor, cho_solve
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+# Largest number of points drawn in a scatter or Q-Q plot
+MAX_PLOT_POINTS = 5000
+
+def read_csv_data(data_json):
+    """Parse CSV text, with the multithreaded pyarrow parser when it is installed."""
+    try:
+        return pd.read_csv(io.BytesIO(data_json.encode('utf-8')), engine='pyarrow')
+    except (ImportError, ValueError):
+        return pd.read_csv(io.StringIO(data_json))
+
+def to_numeric_column(series):
+    """Coerce a column to numeric (invalid values become NaN), skipping columns already numeric."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+    if not pd.api.types.is_object_dtype(series):
+        # e.g. dates typed by the parser: compare as text, as the default parser would leave them
+        series = series.astype(str)
+    return pd.to_numeric(series, errors='coerce')
+
 def perform_regression(data_json, dependent_var, independent_vars, language='Python'):
     """
     Perform OLS regression analysis.
@@ -34,7 +56,7 @@ def perform_regression(data_json, dependent_var, independent_vars, language='Pyt
     """
     try:
         # Parse data
-        df = pd.read_csv(io.StringIO(data_json))
+        df = read_csv_data(data_json)
         
         # Clean column names (remove whitespace)
         df.columns = df.columns.str.strip()
@@ -52,9 +74,9 @@ def perform_regression(data_json, dependent_var, independent_vars, language='Pyt
         y = df[dependent_var]
         X = df[independent_vars]
         
-        # Convert to numeric, coercing errors
-        y = pd.to_numeric(y, errors='coerce')
-        X = X.apply(pd.to_numeric, errors='coerce')
+        # Convert to numeric, coercing errors (columns parsed as numeric are left as is)
+        y = to_numeric_column(y)
+        X = X.apply(to_numeric_column)
         
         # Remove rows with missing values
         combined = pd.concat([y, X], axis=1).dropna()
@@ -68,16 +90,12 @@ def perform_regression(data_json, dependent_var, independent_vars, language='Pyt
         y_clean = combined[dependent_var]
         X_clean = combined[independent_vars]
         
-        # Add constant for intercept
-        X_with_const = sm.add_constant(X_clean)
-        
         # Fit OLS model
-        model = sm.OLS(y_clean, X_with_const)
-        results = model.fit()
+        results = fit_ols(y_clean, X_clean)
         
         # Extract coefficients
         coefficients = []
-        for i, var in enumerate(X_with_const.columns):
+        for i, var in enumerate(results.params.index):
             coef = {
                 'variable': var if var != 'const' else '(Intercept)',
                 'estimate': float(results.params.iloc[i]),
@@ -119,67 +137,133 @@ def perform_regression(data_json, dependent_var, independent_vars, language='Pyt
             'error': str(e)
         }
 
+def fit_ols(y, X):
+    """
+    Fit OLS with an intercept.
+    
+    Solves the least-squares problem directly with NumPy (float64) and returns
+    the subset of statsmodels' RegressionResults attributes used here. Falls
+    back to statsmodels when X already has a constant column or the design
+    matrix is rank deficient.
+    """
+    Xn = X.to_numpy(dtype=np.float64)
+    yn = y.to_numpy(dtype=np.float64)
+    n = Xn.shape[0]
+    if n == 0 or np.any(np.ptp(Xn, axis=0) == 0):
+        return sm.OLS(y, sm.add_constant(X)).fit()
+    
+    design = np.hstack([np.ones((n, 1)), Xn])
+    k = design.shape[1]
+    beta, _, rank, _ = np.linalg.lstsq(design, yn, rcond=None)
+    if rank < k:
+        return sm.OLS(y, sm.add_constant(X)).fit()
+    
+    fitted = design @ beta
+    resid = yn - fitted
+    df_resid = n - k
+    df_model = k - 1
+    ssr = float(resid @ resid)
+    centered_tss = float(np.sum((yn - yn.mean()) ** 2))
+    
+    # Coefficient covariance sigma^2 (X'X)^-1 via a Cholesky solve
+    try:
+        xtx_inv = cho_solve(cho_factor(design.T @ design), np.eye(k))
+    except np.linalg.LinAlgError:
+        return sm.OLS(y, sm.add_constant(X)).fit()
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma2 = ssr / df_resid
+        bse = np.sqrt(sigma2 * np.diag(xtx_inv))
+        tvalues = beta / bse
+        rsquared = 1 - ssr / centered_tss
+        fvalue = ((centered_tss - ssr) / df_model) / sigma2
+    
+    index = ['const'] + list(X.columns)
+    return SimpleNamespace(
+        params=pd.Series(beta, index=index),
+        bse=pd.Series(bse, index=index),
+        tvalues=pd.Series(tvalues, index=index),
+        pvalues=pd.Series(2 * stats.t.sf(np.abs(tvalues), df_resid), index=index),
+        fittedvalues=pd.Series(fitted, index=y.index),
+        resid=pd.Series(resid, index=y.index),
+        rsquared=rsquared,
+        rsquared_adj=1 - (1 - rsquared) * (n - 1) / df_resid,
+        fvalue=fvalue,
+        f_pvalue=stats.f.sf(fvalue, df_model, df_resid),
+        nobs=float(n)
+    )
+
 def generate_plots(results, y, X, dependent_var):
     """Generate diagnostic plots for regression analysis."""
     plots = []
+    fig = None
     
     try:
         # Set style
         plt.style.use('seaborn-v0_8-whitegrid')
         
-        # 1. Residuals vs Fitted plot
+        # One figure, cleared and redrawn for each plot
         fig, ax = plt.subplots(figsize=(8, 6))
+        try:
+            fig.set_layout_engine('constrained')
+        except AttributeError:  # matplotlib < 3.6
+            fig.set_constrained_layout(True)
+        
         fitted = results.fittedvalues
         residuals = results.resid
-        ax.scatter(fitted, residuals, alpha=0.6, edgecolors='black', linewidth=0.5)
+        
+        # Scatter and Q-Q plots draw a fixed random subsample of large samples
+        # (visually identical; the reported statistics use all observations)
+        if len(residuals) > MAX_PLOT_POINTS:
+            idx = np.random.default_rng(0).choice(len(residuals), MAX_PLOT_POINTS, replace=False)
+            r_plot, f_plot, y_plot = residuals.iloc[idx], fitted.iloc[idx], y.iloc[idx]
+        else:
+            r_plot, f_plot, y_plot = residuals, fitted, y
+        
+        # 1. Residuals vs Fitted plot
+        ax.scatter(f_plot, r_plot, alpha=0.6, edgecolors='black', linewidth=0.5)
         ax.axhline(y=0, color='red', linestyle='--', linewidth=1)
         ax.set_xlabel('Fitted Values', fontsize=12)
         ax.set_ylabel('Residuals', fontsize=12)
         ax.set_title('Residuals vs Fitted Values', fontsize=14)
         
-        # Add lowess line
+        # Add lowess line (fitted to the plotted points, which bounds its cost)
         try:
             from statsmodels.nonparametric.smoothers_lowess import lowess
-            smoothed = lowess(residuals, fitted, frac=0.6)
+            smoothed = lowess(r_plot, f_plot, frac=0.6)
             ax.plot(smoothed[:, 0], smoothed[:, 1], color='blue', linewidth=2)
         except:
             pass
         
-        plt.tight_layout()
         plots.append({
             'image': fig_to_base64(fig),
             'title': 'Residuals vs Fitted Values'
         })
-        plt.close(fig)
         
         # 2. Q-Q plot for normality
-        fig, ax = plt.subplots(figsize=(8, 6))
-        sm.qqplot(residuals, line='45', ax=ax, markerfacecolor='steelblue', alpha=0.6)
+        ax.cla()
+        sm.qqplot(r_plot, line='45', ax=ax, markerfacecolor='steelblue', alpha=0.6)
         ax.set_title('Normal Q-Q Plot of Residuals', fontsize=14)
-        plt.tight_layout()
         plots.append({
             'image': fig_to_base64(fig),
             'title': 'Normal Q-Q Plot'
         })
-        plt.close(fig)
         
         # 3. Histogram of residuals
-        fig, ax = plt.subplots(figsize=(8, 6))
+        ax.cla()
         ax.hist(residuals, bins=30, edgecolor='black', alpha=0.7, color='steelblue')
         ax.axvline(x=0, color='red', linestyle='--', linewidth=2)
         ax.set_xlabel('Residuals', fontsize=12)
         ax.set_ylabel('Frequency', fontsize=12)
         ax.set_title('Distribution of Residuals', fontsize=14)
-        plt.tight_layout()
         plots.append({
             'image': fig_to_base64(fig),
             'title': 'Histogram of Residuals'
         })
-        plt.close(fig)
         
         # 4. Actual vs Predicted
-        fig, ax = plt.subplots(figsize=(8, 6))
-        ax.scatter(y, fitted, alpha=0.6, edgecolors='black', linewidth=0.5)
+        ax.cla()
+        ax.scatter(y_plot, f_plot, alpha=0.6, edgecolors='black', linewidth=0.5)
         min_val = min(y.min(), fitted.min())
         max_val = max(y.max(), fitted.max())
         ax.plot([min_val, max_val], [min_val, max_val], 'r--', linewidth=2, label='Perfect Fit')
@@ -187,22 +271,23 @@ def generate_plots(results, y, X, dependent_var):
         ax.set_ylabel(f'Predicted {dependent_var}', fontsize=12)
         ax.set_title('Actual vs Predicted Values', fontsize=14)
         ax.legend()
-        plt.tight_layout()
         plots.append({
             'image': fig_to_base64(fig),
             'title': 'Actual vs Predicted'
         })
-        plt.close(fig)
         
     except Exception as e:
         print(f"Warning: Could not generate some plots: {e}", file=sys.stderr)
+    finally:
+        if fig is not None:
+            plt.close(fig)
     
     return plots
 
 def fig_to_base64(fig):
-    """Convert matplotlib figure to base64 string."""
+    """Convert matplotlib figure to base64 string (fast PNG encode at screen resolution)."""
     buf = io.BytesIO()
-    fig.savefig(buf, format='png', dpi=150, bbox_inches='tight', facecolor='white')
+    fig.savefig(buf, format='png', dpi=90, facecolor='white', pil_kwargs={'compress_level': 1})
     buf.seek(0)
     return base64.b64encode(buf.getvalue()).decode('utf-8')
 